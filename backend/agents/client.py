@@ -1,18 +1,112 @@
 import asyncio
+import threading
+import time
+from contextlib import contextmanager
 
 import anthropic
+import httpx
 
-from backend.config import ANTHROPIC_API_KEY, MAX_CONCURRENT_AI
+from backend.config import (
+    AI_BREAKER_COOLDOWN,
+    AI_BREAKER_THRESHOLD,
+    AI_CALL_TIMEOUT,
+    AI_MAX_RETRIES,
+    ANTHROPIC_API_KEY,
+    MAX_CONCURRENT_AI,
+    MAX_CONCURRENT_AI_CODE,
+    MAX_CONCURRENT_AI_REVIEW,
+)
 
 # Shared async client — reused across all agents
 _client: anthropic.AsyncAnthropic | None = None
+_client_lock = threading.Lock()
 
-# Semaphore to limit concurrent AI calls
-semaphore = asyncio.Semaphore(MAX_CONCURRENT_AI)
+# Separate AI call pools for code and review analysis, so the two stages can
+# overlap without one starving the other
+code_semaphore = asyncio.Semaphore(MAX_CONCURRENT_AI_CODE)
+review_semaphore = asyncio.Semaphore(MAX_CONCURRENT_AI_REVIEW)
+
+# Upstream failures that count towards opening the circuit breaker
+_TRANSIENT_ERRORS = (
+    anthropic.APIConnectionError,
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    TimeoutError,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast once the API has failed repeatedly, then probe again after a cooldown.
+
+    After the cooldown the breaker is half-open: exactly one call goes through
+    as a trial while every other call keeps failing fast. The trial closes the
+    breaker on success and reopens it for another cooldown on a transient error.
+
+    Only transient upstream errors (after the SDK's own retries) are counted;
+    bad model output is the caller's problem and doesn't trip the breaker.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @contextmanager
+    def guard(self):
+        probe = False
+        if self._opened_at is not None:
+            if self._probing or time.monotonic() - self._opened_at < self._cooldown:
+                raise CircuitOpenError("Anthropic API unavailable — skipping call")
+            self._probing = probe = True
+        try:
+            yield
+        except _TRANSIENT_ERRORS:
+            self._failures += 1
+            if probe or self._failures >= self._threshold:
+                self._opened_at = time.monotonic()
+            raise
+        else:
+            self._failures = 0
+            self._opened_at = None
+        finally:
+            # A trial that ends any other way (e.g. cancelled) frees the slot for the next caller
+            if probe:
+                self._probing = False
+
+
+breaker = CircuitBreaker(AI_BREAKER_THRESHOLD, AI_BREAKER_COOLDOWN)
 
 
 def get_client() -> anthropic.AsyncAnthropic:
     global _client
     if _client is None:
-        _client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+        with _client_lock:
+            if _client is None:
+                # Size the pool to the AI concurrency cap so concurrent calls
+                # reuse warm keep-alive connections instead of re-handshaking.
+                http_client = anthropic.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONCURRENT_AI * 2,
+                        max_keepalive_connections=MAX_CONCURRENT_AI * 2,
+                    ),
+                    timeout=httpx.Timeout(AI_CALL_TIMEOUT, connect=5.0),
+                )
+                # The SDK retries 429/5xx/connection errors with jittered
+                # exponential backoff before a request is reported as failed.
+                _client = anthropic.AsyncAnthropic(
+                    api_key=ANTHROPIC_API_KEY,
+                    http_client=http_client,
+                    max_retries=AI_MAX_RETRIES,
+                )
     return _client
+
+
+def cached_system(prompt: str) -> list[dict]:
+    """Wrap a static system prompt so Anthropic caches it as a reusable prefix."""
+    return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
@@ -1,16 +1,43 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import re
 from typing import Callable
 
-from backend.agents.client import get_client, semaphore
+from backend.agents.client import breaker, cached_system, code_semaphore, get_client
+from backend.agents.parsing import read_json
+from backend.agents.progress import ProgressReporter
+from backend.analysis.stats import file_to_module
 from backend.api.schemas import ExpertiseClassification, PRData
-from backend.config import AI_CALL_TIMEOUT, ANTHROPIC_MODEL
+from backend.cache import AsyncCache, content_key
+from backend.config import (
+    AI_CALL_TIMEOUT,
+    ANTHROPIC_MODEL,
+    CODE_BATCH_SIZE,
+    CODE_BATCH_TOKEN_BUDGET,
+    MAX_CONCURRENT_AI_CODE,
+    SMALL_DIFF_TOKENS,
+)
+from backend.ingestion.diffs import CHARS_PER_TOKEN
 
 logger = logging.getLogger(__name__)
 
+# Parsed classifications keyed by content hash, shared across PRs and runs
+_cache = AsyncCache()
+
+# PRs touching only these files are classified without the model
+_DOC_FILE_RE = re.compile(r"\.(md|rst|txt)$", re.IGNORECASE)
+# Dependency manifests and lock files, the only files a version-bump PR may touch
+_MANIFEST_FILE_RE = re.compile(
+    r"(?:^|/)(?:pyproject\.toml|setup\.cfg|Pipfile|requirements[\w.-]*\.(?:txt|in)"
+    r"|package(?:-lock)?\.json|Cargo\.toml|[\w.-]+\.lock)$"
+)
+# A changed line that only sets a version: `version = "1.2"`, `"react": "^18.2.0",`, `httpx==0.28.1`
+_VERSION_LINE_RE = re.compile(
+    r"""^[+-]\s*["']?[\w@/.-]+["']?\s*(?:[:=]=?|>=|~=)\s*["']?[\^~>=<]*v?\d+(?:\.\d+)+[\w.+-]*["']?,?\s*$"""
+)
+
 SYSTEM_PROMPT = """You analyze git diffs to understand expertise depth in engineering teams.
 
 Given a pull request's diff, metadata, and file list, classify the author's expertise:
@@ -46,11 +73,8 @@ Respond with valid JSON matching this schema:
 }"""
 
 
-async def analyze_pr_expertise(pr: PRData, diff: str) -> ExpertiseClassification:
-    """Analyze a single PR's diff to classify expertise depth."""
-    client = get_client()
-
-    user_message = f"""PR #{pr.number}: {pr.title}
+def _pr_message(pr: PRData, diff: str) -> str:
+    return f"""PR #{pr.number}: {pr.title}
 Author: {pr.author}
 Files changed: {pr.changed_files} | +{pr.additions} -{pr.deletions}
 Files: {', '.join(pr.files[:20])}
@@ -59,46 +83,205 @@ Files: {', '.join(pr.files[:20])}
 {diff}
 """
 
-    async with semaphore:
+
+def _to_classification(pr: PRData, data: dict | list) -> ExpertiseClassification:
+    """Validate a model reply (or cached entry) into a classification for ``pr``.
+
+    Raises ValueError (pydantic's ValidationError included) when the reply
+    isn't an object or a field has the wrong type, so bad replies are never
+    cached or returned.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+    return ExpertiseClassification.model_validate({
+        "pr_number": pr.number,
+        "author": pr.author,
+        "change_type": data.get("change_type") or "",
+        "complexity": data.get("complexity") or "",
+        "knowledge_depth": data.get("knowledge_depth") or "working",
+        "expertise_signals": data.get("expertise_signals") or [],
+        "modules_touched": data.get("modules_touched") or [],
+        "summary": data.get("summary") or "",
+    })
+
+
+def _cache_entry(classification: ExpertiseClassification) -> dict:
+    # Only the reply fields are cached; PR number and author come from the PR
+    return classification.model_dump(exclude={"pr_number", "author"})
+
+
+def _changed_lines(diff: str) -> list[str]:
+    return [
+        line for line in diff.splitlines()
+        if line[:1] in "+-" and not line.startswith(("+++", "---"))
+    ]
+
+
+def _fast_classify(pr: PRData, diff: str) -> ExpertiseClassification | None:
+    """Classify docs-only and dependency version-bump PRs locally.
+
+    Returns None when the PR needs the model; size alone never qualifies, as a
+    one-line change can be a subtle fix. The file list is capped by the GitHub
+    query, so only PRs whose full list was fetched qualify.
+    """
+    if not pr.files or len(pr.files) != pr.changed_files:
+        return None
+    rule: tuple[str, str] | None = None
+    if all(_DOC_FILE_RE.search(f) and not _MANIFEST_FILE_RE.search(f) for f in pr.files):
+        rule = ("docs", "Documentation-only change")
+    elif (
+        all(_MANIFEST_FILE_RE.search(f) for f in pr.files)
+        and (changed := _changed_lines(diff))
+        and all(_VERSION_LINE_RE.match(line) for line in changed)
+    ):
+        rule = ("dependency", "Version bump only")
+    if rule is None:
+        return None
+
+    change_type, summary = rule
+    return ExpertiseClassification(
+        pr_number=pr.number,
+        author=pr.author,
+        change_type=change_type,
+        complexity="trivial",
+        knowledge_depth="surface",
+        modules_touched=sorted({file_to_module(f) for f in pr.files}),
+        summary=f"{summary} — classified without AI review.",
+    )
+
+
+def _cache_key(diff: str) -> str:
+    # Identical diffs (cherry-picks, re-applied reverts) share one classification
+    return content_key(ANTHROPIC_MODEL, SYSTEM_PROMPT, diff)
+
+
+async def analyze_pr_expertise(pr: PRData, diff: str) -> ExpertiseClassification:
+    """Analyze a single PR's diff to classify expertise depth."""
+    user_message = _pr_message(pr, diff)
+
+    key = _cache_key(diff)
+    try:
+        data = await _cache.get_or_set(key, lambda: _classify_pr(pr, user_message))
+        return _to_classification(pr, data)
+
+    except (TimeoutError, ValueError, Exception) as e:
+        logger.warning(f"Code analysis failed for PR #{pr.number}: {e}")
+        return ExpertiseClassification(
+            pr_number=pr.number,
+            author=pr.author,
+            knowledge_depth="working",
+            summary=f"Analysis failed: {type(e).__name__}",
+        )
+
+
+async def _classify_pr(pr: PRData, user_message: str) -> dict:
+    """Classify one PR, validating the reply before it is cached."""
+    return _cache_entry(_to_classification(pr, await _classify(user_message)))
+
+
+async def analyze_pr_expertise_batch(
+    prs: list[PRData],
+    diffs: dict[int, str],
+) -> list[ExpertiseClassification]:
+    """Classify several small PRs with a single request.
+
+    The system prompt is unchanged (so its cached prefix is reused); the user
+    message asks for one object per PR. Already-cached PRs are left out of
+    the request. PRs missing from the reply, or the whole batch if the call
+    fails, fall back to one request per PR, as do PRs whose reply fails
+    validation.
+    """
+    results: list[ExpertiseClassification] = []
+    uncached: list[PRData] = []
+    for pr in prs:
+        cached = await _cache.get(_cache_key(diffs[pr.number]))
+        if cached is not None:
+            results.append(_to_classification(pr, cached))
+        else:
+            uncached.append(pr)
+    prs = uncached
+    if len(prs) <= 1:
+        results += await asyncio.gather(*(analyze_pr_expertise(pr, diffs[pr.number]) for pr in prs))
+        return results
+
+    user_message = (
+        f"Classify each of the following {len(prs)} pull requests independently. "
+        'Respond with a JSON array containing one object per PR, each with an extra '
+        '"pr_number" integer field.\n\n'
+        + "\n".join(f"=== PR #{pr.number} ===\n{_pr_message(pr, diffs[pr.number])}" for pr in prs)
+    )
+
+    by_number: dict[int, dict] = {}
+    try:
+        data = await _classify(user_message, max_tokens=1024 * len(prs))
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and isinstance(item.get("pr_number"), int):
+                by_number[item["pr_number"]] = item
+    except (TimeoutError, ValueError, Exception) as e:
+        logger.warning(f"Batched code analysis failed for PRs {[pr.number for pr in prs]}: {e}")
+
+    missing: list[PRData] = []
+    for pr in prs:
+        item = by_number.get(pr.number)
+        if item is None:
+            missing.append(pr)
+            continue
         try:
-            response = await asyncio.wait_for(
-                client.messages.create(
-                    model=ANTHROPIC_MODEL,
-                    max_tokens=1024,
-                    system=SYSTEM_PROMPT,
-                    messages=[{"role": "user", "content": user_message}],
-                ),
-                timeout=AI_CALL_TIMEOUT,
-            )
-
-            text = response.content[0].text
-            # Extract JSON from response (handle markdown code blocks)
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-
-            data = json.loads(text.strip())
-
-            return ExpertiseClassification(
-                pr_number=pr.number,
-                author=pr.author,
-                change_type=data.get("change_type", ""),
-                complexity=data.get("complexity", ""),
-                knowledge_depth=data.get("knowledge_depth", "working"),
-                expertise_signals=data.get("expertise_signals", []),
-                modules_touched=data.get("modules_touched", []),
-                summary=data.get("summary", ""),
-            )
-
-        except (asyncio.TimeoutError, json.JSONDecodeError, Exception) as e:
-            logger.warning(f"Code analysis failed for PR #{pr.number}: {e}")
-            return ExpertiseClassification(
-                pr_number=pr.number,
-                author=pr.author,
-                knowledge_depth="working",
-                summary=f"Analysis failed: {type(e).__name__}",
-            )
+            classification = _to_classification(pr, item)
+        except ValueError as e:
+            logger.warning(f"Invalid batched classification for PR #{pr.number}: {e}")
+            missing.append(pr)
+            continue
+        await _cache.set(_cache_key(diffs[pr.number]), _cache_entry(classification))
+        results.append(classification)
+    if missing:
+        results += await asyncio.gather(*(analyze_pr_expertise(pr, diffs[pr.number]) for pr in missing))
+    return results
+
+
+async def _classify(user_message: str, max_tokens: int = 1024) -> dict | list:
+    """Call the model under the code-analysis semaphore and circuit breaker, and parse its JSON reply."""
+    with breaker.guard():
+        async with code_semaphore:
+            async with asyncio.timeout(AI_CALL_TIMEOUT):
+                return await _stream_response(user_message, max_tokens)
+
+
+async def _stream_response(user_message: str, max_tokens: int) -> dict | list:
+    """Stream the classification, stopping as soon as the JSON value closes."""
+    client = get_client()
+    async with client.messages.stream(
+        model=ANTHROPIC_MODEL,
+        max_tokens=max_tokens,
+        system=cached_system(SYSTEM_PROMPT),
+        messages=[{"role": "user", "content": user_message}],
+    ) as stream:
+        return await read_json(stream)
+
+
+def _plan_batches(prs: list[PRData], diffs: dict[int, str]) -> list[list[PRData]]:
+    """Group small PRs into multi-PR requests; large PRs go one per request."""
+    units: list[list[PRData]] = []
+    small: list[PRData] = []
+    for pr in prs:
+        if len(diffs[pr.number]) // CHARS_PER_TOKEN < SMALL_DIFF_TOKENS:
+            small.append(pr)
+        else:
+            units.append([pr])
+
+    small.sort(key=lambda pr: len(diffs[pr.number]))
+    bucket: list[PRData] = []
+    bucket_tokens = 0
+    for pr in small:
+        tokens = len(diffs[pr.number]) // CHARS_PER_TOKEN
+        if bucket and (len(bucket) >= CODE_BATCH_SIZE or bucket_tokens + tokens > CODE_BATCH_TOKEN_BUDGET):
+            units.append(bucket)
+            bucket, bucket_tokens = [], 0
+        bucket.append(pr)
+        bucket_tokens += tokens
+    if bucket:
+        units.append(bucket)
+    return units
 
 
 async def analyze_batch(
@@ -106,20 +289,36 @@ async def analyze_batch(
     diffs: dict[int, str],
     on_progress: Callable | None = None,
 ) -> list[ExpertiseClassification]:
-    """Analyze multiple PRs concurrently."""
-    tasks = []
-    for pr in prs:
-        diff = diffs.get(pr.number, "")
-        if not diff:
-            continue
-        tasks.append(analyze_pr_expertise(pr, diff))
-
-    results = []
-    total = len(tasks)
-    for i, coro in enumerate(asyncio.as_completed(tasks)):
-        result = await coro
-        results.append(result)
-        if on_progress:
-            await on_progress(i + 1, total)
+    """Analyze multiple PRs concurrently with a fixed pool of workers."""
+    todo = [pr for pr in prs if diffs.get(pr.number)]
+    results: list[ExpertiseClassification] = []
+    needs_model: list[PRData] = []
+    for pr in todo:
+        if fast := _fast_classify(pr, diffs[pr.number]):
+            results.append(fast)
+        else:
+            needs_model.append(pr)
+
+    units = _plan_batches(needs_model, diffs)
+    queue: asyncio.Queue[list[PRData] | None] = asyncio.Queue(maxsize=MAX_CONCURRENT_AI_CODE * 2)
+
+    async def worker():
+        while (unit := await queue.get()) is not None:
+            if len(unit) == 1:
+                results.append(await analyze_pr_expertise(unit[0], diffs[unit[0].number]))
+            else:
+                results.extend(await analyze_pr_expertise_batch(unit, diffs))
+            progress.advance(len(unit))
+
+    async with asyncio.TaskGroup() as tg:
+        progress = ProgressReporter(tg, on_progress, len(todo))
+        if results:
+            progress.advance(len(results))
+        for _ in range(min(MAX_CONCURRENT_AI_CODE, len(units))):
+            tg.create_task(worker())
+        for unit in units:
+            await queue.put(unit)
+        for _ in range(min(MAX_CONCURRENT_AI_CODE, len(units))):
+            await queue.put(None)
 
     return results
@@ -1,35 +1,47 @@
 import asyncio
 import logging
+import re
 import shutil
 from pathlib import Path
 from typing import Any, Callable, Coroutine
 
 from backend.api.schemas import (
     AnalysisResult,
+    CommitRecord,
     PRData,
     WSMessage,
 )
 from backend.analysis.graph_builder import build_graph
-from backend.analysis.pr_ranker import get_prs_with_reviews, rank_prs
-from backend.analysis.stats import (
-    build_contributor_stats,
-    build_module_stats,
-    get_most_changed_files,
-)
+from backend.analysis.pr_ranker import get_prs_with_reviews, rank_prs, summarize_reviews
+from backend.analysis.stats import aggregate_commits
 from backend.agents.code_analyzer import analyze_batch as analyze_code_batch
 from backend.agents.review_analyzer import analyze_batch as analyze_review_batch
 from backend.agents.pattern_detector import detect_patterns
 from backend.config import MAX_BLAME_FILES, MAX_PRS_CODE_ANALYSIS, MAX_PRS_REVIEW_ANALYSIS, MAX_REPO_SIZE_MB
 from backend.ingestion.blame import get_blame_for_files
-from backend.ingestion.clone import check_repo_size, clone_repo, repo_local_path, repo_slug
+from backend.ingestion.clone import (
+    cancel_history_fetch,
+    check_repo_size,
+    clone_repo,
+    repo_local_path,
+    repo_slug,
+    shallow_commits,
+    wait_for_history,
+)
 from backend.ingestion.commits import get_commits
-from backend.ingestion.diffs import get_diff_for_commit
+from backend.ingestion.diffs import DiffBatcher
 from backend.ingestion.github_graphql import fetch_prs
 
 logger = logging.getLogger(__name__)
 
+# run_analysis is driven from the uvicorn process, which runs on uvloop (see
+# --loop in the Dockerfile). Nothing here depends on the loop implementation.
 ProgressCallback = Callable[[WSMessage], Coroutine[Any, Any, None]]
 
+# Fields each later stage changes — partial results after stage 2 carry only these
+STAGE3_FIELDS = {"expertise_classifications", "graph"}
+STAGE4_FIELDS = {"review_classifications"}
+
 
 async def run_analysis(
     repo_url: str,
@@ -49,6 +61,7 @@ async def run_analysis(
     )
 
     clone_path = repo_local_path(repo_url)
+    review_task: asyncio.Task | None = None
     try:
         # ── Stage 1: Data Collection ──
         await emit(WSMessage(type="progress", stage=1, total_stages=5, message="Checking repository size...", progress=0.0))
@@ -62,24 +75,35 @@ async def run_analysis(
             pct = msg.split(":")[-1].strip() if ":" in msg else msg
             await emit(WSMessage(type="progress", stage=1, message=f"Cloning repository... {pct}", progress=0.0))
 
-        repo_path = await clone_repo(repo_url, on_progress=clone_progress)
+        # Only the analysis window (plus a month, so the shallow edge usually
+        # falls outside it) is cloned up front; older history, needed by
+        # blame, arrives in the background while commits and PRs load
+        repo_path = await clone_repo(repo_url, on_progress=clone_progress, history_months=months + 1)
 
         await emit(WSMessage(type="progress", stage=1, message="Extracting commit history...", progress=0.2))
         commits = await get_commits(repo_path, months)
+        if shallow_commits(repo_path).intersection(c.hash for c in commits):
+            # A commit at the shallow edge has no parent to diff against, so its
+            # numstat would be wrong; read the log again once history is complete
+            await wait_for_history(repo_path)
+            commits = await get_commits(repo_path, months)
         result.total_commits = len(commits)
 
         if not commits:
             raise RuntimeError(f"No commits found in the last {months} months. Try a longer time range.")
 
-        # Fetch PRs (non-fatal — gh may not be authenticated)
+        # Fetch PRs (non-fatal — gh may not be authenticated). PRs stream in,
+        # so a timeout or late failure keeps the ones already received.
         await emit(WSMessage(type="progress", stage=1, message="Fetching pull requests...", progress=0.5))
         prs: list[PRData] = []
         try:
-            prs = await asyncio.wait_for(fetch_prs(repo_url, months), timeout=300)
-        except asyncio.TimeoutError:
-            logger.warning("PR fetch timed out — continuing without PR data")
+            async with asyncio.timeout(300):
+                async for pr in fetch_prs(repo_url, months):
+                    prs.append(pr)
+        except TimeoutError:
+            logger.warning(f"PR fetch timed out — continuing with {len(prs)} PRs")
         except Exception as e:
-            logger.warning(f"PR fetch failed ({e}) — continuing without PR data")
+            logger.warning(f"PR fetch failed ({e}) — continuing with {len(prs)} PRs")
         result.total_prs = len(prs)
 
         # Build GitHub login → git email mapping from PR commit data
@@ -93,9 +117,17 @@ async def run_analysis(
 
         # Blame (non-fatal — some files may fail)
         await emit(WSMessage(type="progress", stage=1, message="Running git blame...", progress=0.7))
+        # One pass over the commits feeds blame selection and the stage-2 stats.
+        # Aggregation is CPU-bound on large repos, so it runs in a worker thread
+        # to keep the event loop (other jobs, WebSocket pings) responsive.
+        aggregates = await asyncio.to_thread(
+            aggregate_commits, commits, result.login_to_email, bot_emails=bot_emails
+        )
         blame_results = []
         try:
-            top_files = get_most_changed_files(commits, MAX_BLAME_FILES)
+            # Blame attributes lines to the commits that wrote them, however old
+            await wait_for_history(repo_path)
+            top_files = aggregates.most_changed_files(MAX_BLAME_FILES)
             blame_results = await get_blame_for_files(repo_path, top_files)
         except Exception as e:
             logger.warning(f"Blame analysis failed ({e}) — continuing without blame data")
@@ -105,11 +137,11 @@ async def run_analysis(
         # ── Stage 2: Statistical Analysis ──
         await emit(WSMessage(type="progress", stage=2, message="Building contributor statistics...", progress=0.0))
 
-        contributors = build_contributor_stats(commits, result.login_to_email, bot_emails=bot_emails)
+        contributors = await asyncio.to_thread(aggregates.contributor_stats)
         result.contributors = contributors
         result.total_contributors = len([c for c in contributors if not c.is_bot])
 
-        modules = build_module_stats(commits, blame_results, result.login_to_email, bot_emails=bot_emails)
+        modules = await asyncio.to_thread(aggregates.module_stats, blame_results)
         result.modules = modules
 
         graph = build_graph(contributors, modules)
@@ -120,24 +152,62 @@ async def run_analysis(
             stage=2,
             message="Statistical analysis complete — graph ready",
             progress=1.0,
-            data=result.model_dump(),
+            data=result.model_dump(mode="json"),
         ))
 
+        # Review analysis needs only PR metadata, so it runs alongside stage 3 on
+        # its own AI semaphore. Its progress is held back until stage 3 finishes
+        # so the UI still steps through the stages in order.
+        # Each PR's reviews are summarized once for both the review and code rankers
+        review_summaries = summarize_reviews(prs)
+        review_prs = get_prs_with_reviews(prs, MAX_PRS_REVIEW_ANALYSIS, review_summaries) if prs else []
+        stage3_done = asyncio.Event()
+        reviews_done = 0
+
+        async def review_progress(done: int, total: int):
+            nonlocal reviews_done
+            reviews_done = done
+            if stage3_done.is_set():
+                await emit(WSMessage(
+                    type="progress", stage=4,
+                    message=f"Analyzing {done} of {total} reviewed PRs...",
+                    progress=done / total,
+                ))
+
+        async def run_reviews():
+            try:
+                return await analyze_review_batch(review_prs, on_progress=review_progress)
+            except Exception as e:
+                logger.error(f"Review analysis failed: {e}")
+                return None
+
+        if review_prs:
+            review_task = asyncio.create_task(run_reviews())
+
         # ── Stage 3: AI Code Analysis ──
         if prs:
             await emit(WSMessage(type="progress", stage=3, message="Ranking PRs for AI analysis...", progress=0.0))
 
-            top_prs = rank_prs(prs, MAX_PRS_CODE_ANALYSIS)
+            top_prs = rank_prs(prs, MAX_PRS_CODE_ANALYSIS, review_summaries)
 
             await emit(WSMessage(type="progress", stage=3, message="Fetching PR diffs...", progress=0.1))
-            pr_diffs: dict[int, str] = {}
-            for pr in top_prs:
+            commit_by_pr, commit_by_author = _index_commits(commits)
+
+            diff_tasks: dict[str, asyncio.Task[str]] = {}
+
+            async def fetch_diff(pr: PRData) -> tuple[int, str]:
                 try:
-                    diff = await _get_diff_for_pr(repo_path, pr, commits)
-                    if diff:
-                        pr_diffs[pr.number] = diff
+                    return pr.number, await _get_diff_for_pr(
+                        batcher, pr, commit_by_pr, commit_by_author, diff_tasks,
+                    )
                 except Exception as e:
                     logger.warning(f"Failed to get diff for PR#{pr.number}: {e}")
+                    return pr.number, ""
+
+            # All diffs come from one git process, requests pipelined
+            async with DiffBatcher(repo_path) as batcher:
+                pairs = await asyncio.gather(*(fetch_diff(pr) for pr in top_prs))
+            pr_diffs: dict[int, str] = {number: diff for number, diff in pairs if diff}
 
             if pr_diffs:
                 async def code_progress(done: int, total: int):
@@ -161,7 +231,7 @@ async def run_analysis(
                 stage=3,
                 message="Code analysis complete — expertise mapped",
                 progress=1.0,
-                data=result.model_dump(),
+                data=result.model_dump(mode="json", include=STAGE3_FIELDS),
             ))
         else:
             await emit(WSMessage(
@@ -169,34 +239,28 @@ async def run_analysis(
                 stage=3,
                 message="No PRs available — skipping code analysis",
                 progress=1.0,
-                data=result.model_dump(),
+                data=result.model_dump(mode="json", include=STAGE3_FIELDS),
             ))
 
         # ── Stage 4: AI Review Analysis ──
-        review_prs = get_prs_with_reviews(prs, MAX_PRS_REVIEW_ANALYSIS) if prs else []
-
-        if review_prs:
-            await emit(WSMessage(type="progress", stage=4, message="Analyzing review quality...", progress=0.0))
-
-            async def review_progress(done: int, total: int):
-                await emit(WSMessage(
-                    type="progress", stage=4,
-                    message=f"Analyzing {done} of {total} reviewed PRs...",
-                    progress=done / total,
-                ))
+        if review_task:
+            stage3_done.set()
+            await emit(WSMessage(
+                type="progress", stage=4,
+                message="Analyzing review quality...",
+                progress=reviews_done / len(review_prs),
+            ))
 
-            try:
-                review_results = await analyze_review_batch(review_prs, on_progress=review_progress)
+            review_results = await review_task
+            if review_results is not None:
                 result.review_classifications = review_results
-            except Exception as e:
-                logger.error(f"Review analysis failed: {e}")
 
             await emit(WSMessage(
                 type="partial_result",
                 stage=4,
                 message="Review analysis complete",
                 progress=1.0,
-                data=result.model_dump(),
+                data=result.model_dump(mode="json", include=STAGE4_FIELDS),
             ))
         else:
             await emit(WSMessage(
@@ -204,15 +268,16 @@ async def run_analysis(
                 stage=4,
                 message="No reviews available — skipping review analysis",
                 progress=1.0,
-                data=result.model_dump(),
+                data=result.model_dump(mode="json", include=STAGE4_FIELDS),
             ))
 
         # ── Stage 5: Deep Reasoning ──
         await emit(WSMessage(type="progress", stage=5, message="Deep reasoning with extended thinking...", progress=0.0))
 
+        # Patterns run on the complete result: review quality is one of the
+        # signals the insights draw on, so they wait for stage 4
         try:
-            pattern_result = await detect_patterns(result)
-            result.pattern_result = pattern_result
+            result.pattern_result = await detect_patterns(result)
         except Exception as e:
             logger.error(f"Deep reasoning failed: {e}")
             # Result still usable without deep reasoning
@@ -227,27 +292,55 @@ async def run_analysis(
 
         return result
     finally:
+        if review_task and not review_task.done():
+            review_task.cancel()
+        await cancel_history_fetch(clone_path)
         if clone_path.exists():
-            logger.info(f"Cleaning up clone: {clone_path}")
-            shutil.rmtree(clone_path, ignore_errors=True)
+            # Deleting a large clone takes seconds — do it off the event loop, and
+            # shield it so a cancelled run still finishes cleaning up
+            await asyncio.shield(asyncio.to_thread(shutil.rmtree, clone_path, ignore_errors=True))
+            logger.info(f"Cleaned up clone: {clone_path}")
+
+
+_PR_REF_RE = re.compile(r"#(\d+)")
+
 
+def _index_commits(commits: list[CommitRecord]) -> tuple[dict[int, CommitRecord], dict[str, CommitRecord]]:
+    """Index commits by referenced PR number and by author key, in one pass.
 
-async def _get_diff_for_pr(repo_path: Path, pr, commits) -> str:
-    """Find a commit that matches this PR and get its diff."""
-    # Strategy: look for merge commits mentioning the PR number, or use
-    # commits by the PR author around the merge time
+    Commits arrive newest first, so setdefault keeps the most recent match.
+    Author keys are the lowercased name, the email local part, and the login
+    embedded in GitHub noreply addresses (``123+login@users.noreply...``).
+    """
+    by_pr: dict[int, CommitRecord] = {}
+    by_author: dict[str, CommitRecord] = {}
     for c in commits:
-        if f"#{pr.number}" in c.message or f"#{pr.number} " in c.message:
-            return await get_diff_for_commit(repo_path, c.hash)
-
-    # Fallback: find commits by the PR author
-    author_commits = [
-        c for c in commits
-        if c.author_name.lower() == pr.author.lower()
-        or c.author_email.lower().startswith(pr.author.lower())
-    ]
-    if author_commits:
-        # Use the most recent one
-        return await get_diff_for_commit(repo_path, author_commits[0].hash)
-
-    return ""
+        for ref in _PR_REF_RE.findall(c.message):
+            by_pr.setdefault(int(ref), c)
+        local = c.author_email.lower().split("@", 1)[0]
+        for key in (c.author_name.lower(), local, local.rpartition("+")[2]):
+            if key:
+                by_author.setdefault(key, c)
+    return by_pr, by_author
+
+
+async def _get_diff_for_pr(
+    batcher: DiffBatcher,
+    pr: PRData,
+    commit_by_pr: dict[int, CommitRecord],
+    commit_by_author: dict[str, CommitRecord],
+    diff_tasks: dict[str, asyncio.Task[str]],
+) -> str:
+    """Find a commit that matches this PR and get its diff.
+
+    ``diff_tasks`` is shared across the run, so PRs resolving to the same
+    commit share one diff request instead of each asking for it.
+    """
+    # Strategy: prefer a commit mentioning the PR number, else the PR
+    # author's most recent commit
+    commit = commit_by_pr.get(pr.number) or commit_by_author.get(pr.author.lower())
+    if not commit:
+        return ""
+    if commit.hash not in diff_tasks:
+        diff_tasks[commit.hash] = asyncio.create_task(batcher.diff(commit.hash))
+    return await diff_tasks[commit.hash]
@@ -0,0 +1,131 @@
+"""Helpers for pulling JSON payloads out of streamed model responses."""
+
+import asyncio
+from typing import Any
+
+from anthropic.lib.streaming import AsyncMessageStream
+from pydantic_core import from_json
+
+# Payloads above this size are parsed off the event loop
+_THREAD_PARSE_THRESHOLD = 16384
+
+_FENCE = "```"
+
+
+def extract_json(text: str) -> str:
+    """Return the body of the first Markdown code fence, or the text itself.
+
+    Plain ``str.find`` slicing: one substring per call, no regex backtracking
+    over large batch responses.
+    """
+    start = text.find(_FENCE)
+    if start < 0:
+        return text.strip()
+    end = text.find(_FENCE, start + 3)
+    if end < 0:
+        return text.strip()
+    return text[start + 3:end].removeprefix("json").strip()
+
+
+async def parse_json(text: str) -> Any:
+    """Parse JSON with pydantic-core's Rust parser, in a worker thread if large.
+
+    Raises ValueError on malformed input.
+    """
+    if len(text) < _THREAD_PARSE_THRESHOLD:
+        return from_json(text)
+    return await asyncio.to_thread(from_json, text)
+
+
+class JsonScanner:
+    """Track streamed text until its first top-level JSON value is complete.
+
+    Text before the opening brace/bracket is ignored, and braces inside string
+    literals don't count towards nesting depth. An opening code fence takes
+    precedence over brackets in the prose before it, so the value is taken
+    from inside the fence.
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self._offset = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._ticks = 0
+        self._fenced = False
+
+    @property
+    def complete(self) -> bool:
+        return self._end != -1
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk of text; return True once the JSON value has closed."""
+        self._parts.append(chunk)
+        if self.complete:
+            return True
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == "`":
+                self._ticks += 1
+                if self._ticks == 3 and not self._fenced:
+                    # Anything opened before the fence was prose, e.g. "[see below]"
+                    self._fenced = True
+                    self._start = -1
+                    self._depth = 0
+                continue
+            self._ticks = 0
+            if ch == '"':
+                if self._start != -1:
+                    self._in_string = True
+            elif ch in "{[":
+                if self._start == -1:
+                    self._start = self._offset + i
+                self._depth += 1
+            elif ch in "}]" and self._start != -1:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = self._offset + i + 1
+                    break
+        self._offset += len(chunk)
+        return self.complete
+
+    def text(self) -> str:
+        """Return the completed JSON value, or all text seen if it never closed."""
+        if self.complete:
+            return "".join(self._parts)[self._start:self._end]
+        return self.full_text()
+
+    def full_text(self) -> str:
+        """Return all text fed so far, including any after the value closed."""
+        return "".join(self._parts)
+
+
+async def read_json(stream: AsyncMessageStream) -> Any:
+    """Read a message stream only until its first JSON value is complete, and parse it.
+
+    Returning early lets the caller close the stream, which aborts the
+    remaining generation instead of waiting on trailing tokens. If that value
+    doesn't parse, the rest of the stream is read and its first code fence
+    (or the whole text) is parsed instead. Raises ValueError on malformed input.
+    """
+    scanner = JsonScanner()
+    chunks = aiter(stream.text_stream)
+    async for text in chunks:
+        if scanner.feed(text):
+            try:
+                return await parse_json(scanner.text())
+            except ValueError:
+                break
+    async for text in chunks:
+        scanner.feed(text)
+    return await parse_json(extract_json(scanner.full_text()))
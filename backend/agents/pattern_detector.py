@@ -1,9 +1,11 @@
 import asyncio
-import json
 import logging
 import re
+from heapq import nlargest
+from operator import itemgetter
 
-from backend.agents.client import get_client
+from backend.agents.client import cached_system, get_client
+from backend.agents.parsing import extract_json, parse_json
 from backend.api.schemas import (
     AnalysisResult,
     InsightCard,
@@ -70,7 +72,7 @@ async def detect_patterns(result: AnalysisResult) -> PatternDetectionResult:
             thinking={
                 "type": "adaptive",
             },
-            system=SYSTEM_PROMPT,
+            system=cached_system(SYSTEM_PROMPT),
             messages=[{"role": "user", "content": data_summary}],
         ) as stream:
             async for event in stream:
@@ -78,12 +80,7 @@ async def detect_patterns(result: AnalysisResult) -> PatternDetectionResult:
                     if hasattr(event.delta, "text"):
                         text += event.delta.text
 
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-
-        data = json.loads(text.strip())
+        data = await parse_json(extract_json(text))
 
         return PatternDetectionResult(
             executive_summary=data.get("executive_summary", ""),
@@ -101,7 +98,7 @@ async def detect_patterns(result: AnalysisResult) -> PatternDetectionResult:
             recommendations=data.get("recommendations", []),
         )
 
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         logger.error(f"Deep reasoning JSON parse failed: {e}\nRaw text: {text[:500]}")
         return PatternDetectionResult(
             executive_summary="Deep reasoning completed but output parsing failed.",
@@ -153,9 +150,7 @@ def _build_data_summary(result: AnalysisResult) -> str:
 
     parts.append("\n## Module Ownership & Bus Factor")
     for m in result.modules[:15]:
-        top_owners = sorted(
-            m.blame_ownership.items(), key=lambda x: -x[1]
-        )[:3]
+        top_owners = nlargest(3, m.blame_ownership.items(), key=itemgetter(1))
         ownership_str = ", ".join(
             f"{_name(email)}: {pct:.0%}" for email, pct in top_owners
         )
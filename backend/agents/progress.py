@@ -0,0 +1,30 @@
+"""Background progress reporting for the AI batch workers."""
+
+import asyncio
+from typing import Callable
+
+
+class ProgressReporter:
+    """Report batch progress from a background task so workers never wait on it.
+
+    Counts that arrive while a report is in flight are coalesced: the next
+    report sends the latest count, so updates always go out in order.
+    """
+
+    def __init__(self, tg: asyncio.TaskGroup, on_progress: Callable | None, total: int):
+        self._tg = tg
+        self._on_progress = on_progress
+        self._total = total
+        self._done = 0
+        self._sent = 0
+        self._task: asyncio.Task | None = None
+
+    def advance(self, n: int = 1) -> None:
+        self._done += n
+        if self._on_progress and (self._task is None or self._task.done()):
+            self._task = self._tg.create_task(self._report())
+
+    async def _report(self) -> None:
+        while self._sent != self._done:
+            self._sent = self._done
+            await self._on_progress(self._sent, self._total)
@@ -1,16 +1,34 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import os
+from itertools import islice
 from typing import Callable
 
-from backend.agents.client import get_client, semaphore
-from backend.api.schemas import PRData, ReviewClassification
-from backend.config import AI_CALL_TIMEOUT, ANTHROPIC_MODEL
+from backend.agents.client import breaker, cached_system, get_client, review_semaphore
+from backend.agents.parsing import read_json
+from backend.agents.progress import ProgressReporter
+from backend.api.schemas import PRData, PRReview, ReviewClassification
+from backend.cache import AsyncCache, DiskStore, content_key
+from backend.config import (
+    AI_CACHE_DIR,
+    AI_CACHE_TTL,
+    AI_CALL_TIMEOUT,
+    ANTHROPIC_MODEL,
+    MAX_CONCURRENT_AI_REVIEW,
+    REVIEW_BATCH_SIZE,
+)
 
 logger = logging.getLogger(__name__)
 
+# Per the system prompt, an approval under this many words with no line comments is a rubber stamp
+_TRIVIAL_WORDS = 10
+
+# Parsed classifications keyed by content hash, shared across PRs and runs,
+# and persisted so re-analyzing a repo skips PRs whose reviews haven't changed
+_cache = AsyncCache(store=DiskStore(os.path.join(AI_CACHE_DIR, "reviews"), AI_CACHE_TTL) if AI_CACHE_DIR else None)
+
 SYSTEM_PROMPT = """You assess the quality of code reviews in engineering teams.
 
 Given a PR's reviews (reviewer name, state, body text), classify each review:
@@ -45,29 +63,61 @@ Respond with a JSON array of review classifications:
 }]"""
 
 
-async def analyze_pr_reviews(pr: PRData) -> list[ReviewClassification]:
-    """Analyze review quality for a single PR."""
-    client = get_client()
+def _is_trivial(r: PRReview) -> bool:
+    """An empty review, or a brief approval, with no line comments.
+
+    Brief reviews in any other state (e.g. a one-line change request) still
+    carry substance and go to the model.
+    """
+    if r.review_comments:
+        return False
+    words = r.body.split()
+    return not words or (r.state == "APPROVED" and len(words) < _TRIVIAL_WORDS)
 
+
+def _fast_classify(pr: PRData) -> list[ReviewClassification] | None:
+    """Classify PRs whose reviews are all empty or brief approvals locally.
+
+    Returns None when any review needs the model.
+    """
+    if not all(_is_trivial(r) for r in pr.reviews):
+        return None
+    return [
+        ReviewClassification(
+            pr_number=pr.number,
+            reviewer=r.author,
+            quality="rubber_stamp",
+            signals=["Empty body" if not r.body.strip() else "Short body", "No line comments"],
+            knowledge_transfer=False,
+            summary=(
+                "Brief approval" if r.body.strip() else "Empty review"
+            ) + " — classified without AI review.",
+        )
+        for r in pr.reviews
+    ]
+
+
+def _reviews_text(pr: PRData) -> str:
     review_parts = []
     for r in pr.reviews:
-        part = f"Reviewer: {r.author}\nState: {r.state}\nBody: {r.body or '(empty)'}"
+        lines = [f"Reviewer: {r.author}", f"State: {r.state}", f"Body: {r.body or '(empty)'}"]
         if r.review_comments:
             # Include up to 15 line comments to stay within token limits
-            comments_preview = r.review_comments[:15]
-            part += f"\nLine comments ({len(r.review_comments)} total):"
-            for j, c in enumerate(comments_preview, 1):
+            lines.append(f"Line comments ({len(r.review_comments)} total):")
+            for j, c in enumerate(islice(r.review_comments, 15), 1):
                 # Truncate long comments
                 snippet = c[:300] + "..." if len(c) > 300 else c
-                part += f"\n  {j}. {snippet}"
+                lines.append(f"  {j}. {snippet}")
             if len(r.review_comments) > 15:
-                part += f"\n  ... and {len(r.review_comments) - 15} more comments"
+                lines.append(f"  ... and {len(r.review_comments) - 15} more comments")
         else:
-            part += "\nLine comments: none"
-        review_parts.append(part)
-    reviews_text = "\n\n".join(review_parts)
+            lines.append("Line comments: none")
+        review_parts.append("\n".join(lines))
+    return "\n\n".join(review_parts)
+
 
-    user_message = f"""PR #{pr.number}: {pr.title}
+def _pr_message(pr: PRData, reviews_text: str) -> str:
+    return f"""PR #{pr.number}: {pr.title}
 Author: {pr.author}
 +{pr.additions} -{pr.deletions} across {pr.changed_files} files
 
@@ -75,66 +125,183 @@ Author: {pr.author}
 {reviews_text}
 """
 
-    async with semaphore:
-        try:
-            response = await asyncio.wait_for(
-                client.messages.create(
-                    model=ANTHROPIC_MODEL,
-                    max_tokens=1024,
-                    system=SYSTEM_PROMPT,
-                    messages=[{"role": "user", "content": user_message}],
-                ),
-                timeout=AI_CALL_TIMEOUT,
+
+def _to_classifications(pr: PRData, data: dict | list) -> list[ReviewClassification]:
+    """Validate a model reply (or cached entry) into classifications for ``pr``.
+
+    Raises ValueError (pydantic's ValidationError included) when an item has
+    a wrongly typed field, so bad replies are never cached or returned.
+    """
+    if not isinstance(data, list):
+        data = [data]
+    return [
+        ReviewClassification.model_validate({
+            "pr_number": pr.number,
+            "reviewer": item.get("reviewer") or "unknown",
+            "quality": item.get("quality") or "surface",
+            "signals": item.get("signals") or [],
+            "knowledge_transfer": item.get("knowledge_transfer") or False,
+            "summary": item.get("summary") or "",
+        })
+        for item in data
+        if isinstance(item, dict)
+    ]
+
+
+def _cache_entry(classifications: list[ReviewClassification]) -> list[dict]:
+    # Only the reply fields are cached; the PR number comes from the PR
+    return [c.model_dump(exclude={"pr_number"}) for c in classifications]
+
+
+def _cache_key(reviews_text: str) -> str:
+    # PRs with identical review threads share one classification
+    return content_key(ANTHROPIC_MODEL, SYSTEM_PROMPT, reviews_text)
+
+
+async def analyze_pr_reviews(pr: PRData) -> list[ReviewClassification]:
+    """Analyze review quality for a single PR."""
+    reviews_text = _reviews_text(pr)
+    user_message = _pr_message(pr, reviews_text)
+
+    key = _cache_key(reviews_text)
+    try:
+        data = await _cache.get_or_set(key, lambda: _classify_pr(pr, user_message))
+        return _to_classifications(pr, data)
+
+    except (TimeoutError, ValueError, Exception) as e:
+        logger.warning(f"Review analysis failed for PR #{pr.number}: {e}")
+        return [
+            ReviewClassification(
+                pr_number=pr.number,
+                reviewer=r.author,
+                quality="rubber_stamp" if _is_trivial(r) else "surface",
+                summary=f"Analysis failed: {type(e).__name__}",
             )
+            for r in pr.reviews
+        ]
+
 
-            text = response.content[0].text
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-
-            data = json.loads(text.strip())
-            if not isinstance(data, list):
-                data = [data]
-
-            return [
-                ReviewClassification(
-                    pr_number=pr.number,
-                    reviewer=item.get("reviewer", "unknown"),
-                    quality=item.get("quality", "surface"),
-                    signals=item.get("signals", []),
-                    knowledge_transfer=item.get("knowledge_transfer", False),
-                    summary=item.get("summary", ""),
-                )
-                for item in data
-            ]
-
-        except (asyncio.TimeoutError, json.JSONDecodeError, Exception) as e:
-            logger.warning(f"Review analysis failed for PR #{pr.number}: {e}")
-            return [
-                ReviewClassification(
-                    pr_number=pr.number,
-                    reviewer=r.author,
-                    quality="rubber_stamp" if (len(r.body.strip()) < 10 and not r.review_comments) else "surface",
-                    summary=f"Analysis failed: {type(e).__name__}",
-                )
-                for r in pr.reviews
-            ]
+async def _classify_pr(pr: PRData, user_message: str) -> list[dict]:
+    """Classify one PR's reviews, validating the reply before it is cached."""
+    return _cache_entry(_to_classifications(pr, await _classify(user_message)))
+
+
+async def analyze_pr_reviews_batch(prs: list[PRData]) -> list[ReviewClassification]:
+    """Classify the reviews of several PRs with a single request.
+
+    The system prompt is unchanged (so its cached prefix is reused); the user
+    message asks for an object keyed by PR number. Already-cached PRs are
+    left out of the request. PRs missing from the reply, or the whole batch if
+    the call fails, fall back to one request per PR, as do PRs whose reply
+    fails validation.
+    """
+    results: list[ReviewClassification] = []
+    texts: dict[int, str] = {}
+    for pr in prs:
+        reviews_text = _reviews_text(pr)
+        cached = await _cache.get(_cache_key(reviews_text))
+        try:
+            if cached is not None:
+                results.extend(_to_classifications(pr, cached))
+                continue
+        except ValueError:
+            # Written to disk by an older version; re-classify and overwrite it
+            pass
+        texts[pr.number] = reviews_text
+    prs = [pr for pr in prs if pr.number in texts]
+    if len(prs) <= 1:
+        for pr in prs:
+            results.extend(await analyze_pr_reviews(pr))
+        return results
+
+    user_message = (
+        f"Classify the reviews of each of the following {len(prs)} pull requests independently. "
+        "Respond with a JSON object mapping each PR number (as a string) to that PR's "
+        "array of review classifications.\n\n"
+        + "\n".join(f"=== PR #{pr.number} ===\n{_pr_message(pr, texts[pr.number])}" for pr in prs)
+    )
+
+    data: dict = {}
+    try:
+        reply = await _classify(user_message, max_tokens=1024 * len(prs))
+        if isinstance(reply, dict):
+            data = reply
+    except (TimeoutError, ValueError, Exception) as e:
+        logger.warning(f"Batched review analysis failed for PRs {[pr.number for pr in prs]}: {e}")
+
+    missing: list[PRData] = []
+    for pr in prs:
+        items = data.get(str(pr.number))
+        if not (isinstance(items, list) and items):
+            missing.append(pr)
+            continue
+        try:
+            classified = _to_classifications(pr, items)
+        except ValueError as e:
+            logger.warning(f"Invalid batched classification for PR #{pr.number}: {e}")
+            missing.append(pr)
+            continue
+        await _cache.set(_cache_key(texts[pr.number]), _cache_entry(classified))
+        results.extend(classified)
+    for classified in await asyncio.gather(*(analyze_pr_reviews(pr) for pr in missing)):
+        results.extend(classified)
+    return results
+
+
+async def _classify(user_message: str, max_tokens: int = 1024) -> dict | list:
+    """Call the model under the review-analysis semaphore and circuit breaker, and parse its JSON reply."""
+    with breaker.guard():
+        async with review_semaphore:
+            async with asyncio.timeout(AI_CALL_TIMEOUT):
+                return await _stream_response(user_message, max_tokens)
+
+
+async def _stream_response(user_message: str, max_tokens: int) -> dict | list:
+    """Stream the classifications, stopping as soon as the JSON value closes."""
+    client = get_client()
+    async with client.messages.stream(
+        model=ANTHROPIC_MODEL,
+        max_tokens=max_tokens,
+        system=cached_system(SYSTEM_PROMPT),
+        messages=[{"role": "user", "content": user_message}],
+    ) as stream:
+        return await read_json(stream)
 
 
 async def analyze_batch(
     prs: list[PRData],
     on_progress: Callable | None = None,
 ) -> list[ReviewClassification]:
-    """Analyze reviews for multiple PRs concurrently."""
-    tasks = [analyze_pr_reviews(pr) for pr in prs if pr.reviews]
-
-    results = []
-    total = len(tasks)
-    for i, coro in enumerate(asyncio.as_completed(tasks)):
-        batch_results = await coro
-        results.extend(batch_results)
-        if on_progress:
-            await on_progress(i + 1, total)
+    """Analyze reviews for multiple PRs concurrently with a fixed pool of workers."""
+    todo = [pr for pr in prs if pr.reviews]
+    results: list[ReviewClassification] = []
+    needs_model: list[PRData] = []
+    for pr in todo:
+        if (fast := _fast_classify(pr)) is not None:
+            results.extend(fast)
+        else:
+            needs_model.append(pr)
+
+    units = [needs_model[i:i + REVIEW_BATCH_SIZE] for i in range(0, len(needs_model), REVIEW_BATCH_SIZE)]
+    queue: asyncio.Queue[list[PRData] | None] = asyncio.Queue(maxsize=MAX_CONCURRENT_AI_REVIEW * 2)
+
+    async def worker():
+        while (unit := await queue.get()) is not None:
+            if len(unit) == 1:
+                results.extend(await analyze_pr_reviews(unit[0]))
+            else:
+                results.extend(await analyze_pr_reviews_batch(unit))
+            progress.advance(len(unit))
+
+    async with asyncio.TaskGroup() as tg:
+        progress = ProgressReporter(tg, on_progress, len(todo))
+        if len(needs_model) < len(todo):
+            progress.advance(len(todo) - len(needs_model))
+        for _ in range(min(MAX_CONCURRENT_AI_REVIEW, len(units))):
+            tg.create_task(worker())
+        for unit in units:
+            await queue.put(unit)
+        for _ in range(min(MAX_CONCURRENT_AI_REVIEW, len(units))):
+            await queue.put(None)
 
     return results
@@ -1,3 +1,6 @@
+from bisect import bisect_left
+from itertools import islice
+
 from backend.api.schemas import (
     ContributorStats,
     ExpertiseClassification,
@@ -8,6 +11,9 @@ from backend.api.schemas import (
     ReviewClassification,
 )
 
+# Ordinal of each knowledge depth; unknown depths rank as "working"
+_DEPTH_RANK = {"surface": 0, "working": 1, "deep": 2, "architect": 3}
+
 
 def bus_factor_color(bf: float) -> str:
     """Map bus factor (0-1) to risk color."""
@@ -54,12 +60,12 @@ def build_graph(
             email = username_to_email.get(ec.author.lower(), "")
             if not email:
                 continue
-            if email not in expertise_by_email:
-                expertise_by_email[email] = {}
+            depths = expertise_by_email.setdefault(email, {})
+            rank = _DEPTH_RANK.get(ec.knowledge_depth, 1)
             for mod in ec.modules_touched:
-                current = expertise_by_email[email].get(mod, "surface")
-                if _depth_rank(ec.knowledge_depth) > _depth_rank(current):
-                    expertise_by_email[email][mod] = ec.knowledge_depth
+                current = depths.get(mod, "surface")
+                if rank > _DEPTH_RANK.get(current, 1):
+                    depths[mod] = ec.knowledge_depth
 
     max_commits = max((c.total_commits for c in contributors), default=1)
 
@@ -96,6 +102,8 @@ def build_graph(
 
     # Links: contributor -> module
     module_set = {m.module for m in top_modules}
+    # Node ids with at least one link, collected while the links are built
+    linked_ids: set[str] = set()
     for m in top_modules:
         for author_email, cs in m.contributors.items():
             weight = cs.commits / max_mod_commits
@@ -105,16 +113,18 @@ def build_graph(
             # Look up expertise depth by email
             depth = expertise_by_email.get(author_email, {}).get(m.module, "working")
 
+            source, target = f"c:{author_email}", f"m:{m.module}"
+            linked_ids.add(source)
+            linked_ids.add(target)
             links.append(GraphLink(
-                source=f"c:{author_email}",
-                target=f"m:{m.module}",
+                source=source,
+                target=target,
                 weight=round(weight, 3),
                 commits=cs.commits,
                 expertise_depth=depth,
             ))
 
     # Filter out orphan nodes (contributors with no links to top modules)
-    linked_ids = {l.source for l in links} | {l.target for l in links}
     nodes = [n for n in nodes if n.id in linked_ids]
 
     return GraphData(nodes=nodes, links=links)
@@ -124,12 +134,17 @@ def _build_username_email_map(
     contributors: list[ContributorStats],
     usernames: list[str],
 ) -> dict[str, str]:
-    """Map GitHub usernames to git emails using multiple heuristics."""
-    result: dict[str, str] = {}
-    username_set = {u.lower() for u in usernames}
-    unmatched = set(username_set)
-
-    for c in contributors:
+    """Map GitHub usernames to git emails using multiple heuristics.
+
+    Each username maps to the first contributor (in list order) that matches
+    any strategy. Contributors are indexed once by email prefix and domain
+    name, so each username costs a few dict lookups and a bisect rather than
+    a scan over every contributor.
+    """
+    # First contributor index per email prefix / domain name
+    by_prefix: dict[str, int] = {}
+    by_domain: dict[str, int] = {}
+    for i, c in enumerate(contributors):
         email_lower = c.email.lower()
         prefix = email_lower.split("@")[0]
         # Handle noreply: "12345+username@users.noreply.github.com"
@@ -137,23 +152,26 @@ def _build_username_email_map(
             prefix = prefix.split("+", 1)[1]
         domain = email_lower.split("@")[1] if "@" in email_lower else ""
         domain_name = domain.split(".")[0] if domain else ""
+        by_prefix.setdefault(prefix, i)
+        by_domain.setdefault(domain_name, i)
+    sorted_prefixes = sorted(by_prefix)
 
-        for uname in list(unmatched):
-            # Strategy 1: exact prefix match (davidism@gmail.com ↔ davidism)
-            if uname == prefix:
-                result[uname] = c.email
-                unmatched.discard(uname)
-            # Strategy 2: username in domain name (m@mitchellh.com ↔ mitchellh)
-            elif uname == domain_name:
-                result[uname] = c.email
-                unmatched.discard(uname)
-            # Strategy 3: prefix starts with username or vice versa (3+ chars)
-            elif len(uname) >= 3 and (prefix.startswith(uname) or uname.startswith(prefix)):
-                result[uname] = c.email
-                unmatched.discard(uname)
+    result: dict[str, str] = {}
+    for uname in {u.lower() for u in usernames}:
+        # Strategy 1: exact prefix match (davidism@gmail.com ↔ davidism)
+        # Strategy 2: username in domain name (m@mitchellh.com ↔ mitchellh)
+        candidates = [by_prefix.get(uname), by_domain.get(uname)]
+        # Strategy 3: prefix starts with username or vice versa (3+ chars)
+        if len(uname) >= 3:
+            # Prefixes that are themselves prefixes of the username
+            candidates += [by_prefix.get(uname[:k]) for k in range(len(uname))]
+            # Prefixes that start with the username (a contiguous sorted range)
+            for prefix in islice(sorted_prefixes, bisect_left(sorted_prefixes, uname), None):
+                if not prefix.startswith(uname):
+                    break
+                candidates.append(by_prefix[prefix])
+        matches = [i for i in candidates if i is not None]
+        if matches:
+            result[uname] = contributors[min(matches)].email
 
     return result
-
-
-def _depth_rank(depth: str) -> int:
-    return {"surface": 0, "working": 1, "deep": 2, "architect": 3}.get(depth, 1)
@@ -1,49 +1,74 @@
+from dataclasses import dataclass
+from heapq import nlargest
+from operator import itemgetter
+
 from backend.api.schemas import PRData
 
 
-def rank_prs(prs: list[PRData], top_n: int = 30) -> list[PRData]:
+# Controversy weight per review state (changes requested weighs most)
+_STATE_WEIGHTS = {"CHANGES_REQUESTED": 1.5, "APPROVED": 0.3, "COMMENTED": 0.5}
+
+
+@dataclass(slots=True)
+class ReviewSummary:
+    """Per-PR review figures used by both rankers, from one pass over its reviews."""
+
+    controversy: float = 0.0
+    # Body length, with each line comment counting as 100 chars
+    depth: int = 0
+    has_content: bool = False
+
+
+def summarize_reviews(prs: list[PRData]) -> dict[int, ReviewSummary]:
+    """Summarize each PR's reviews, keyed by PR number."""
+    weight = _STATE_WEIGHTS.get
+    summaries: dict[int, ReviewSummary] = {}
+    for pr in prs:
+        s = ReviewSummary()
+        for r in pr.reviews:
+            s.controversy += weight(r.state, 0.0)
+            s.depth += len(r.body) + len(r.review_comments) * 100
+            if not s.has_content:
+                s.has_content = _review_has_content(r)
+        summaries[pr.number] = s
+    return summaries
+
+
+def rank_prs(
+    prs: list[PRData],
+    top_n: int = 30,
+    summaries: dict[int, ReviewSummary] | None = None,
+) -> list[PRData]:
     """Rank PRs by significance for AI analysis pre-filtering.
 
     Score based on: size + breadth + discussion + controversy.
     """
-    scored: list[tuple[float, PRData]] = []
+    if summaries is None:
+        summaries = summarize_reviews(prs)
 
-    for pr in prs:
+    def score(pr: PRData) -> float:
         size_score = min((pr.additions + pr.deletions) / 500, 3.0)
         breadth_score = min(pr.changed_files / 5, 2.0)
         discussion_score = min(pr.comments / 3, 2.0)
+        return size_score + breadth_score + discussion_score + summaries[pr.number].controversy
 
-        # Controversy: changes requested or many reviews
-        controversy = 0.0
-        for r in pr.reviews:
-            if r.state == "CHANGES_REQUESTED":
-                controversy += 1.5
-            elif r.state == "APPROVED":
-                controversy += 0.3
-            elif r.state == "COMMENTED":
-                controversy += 0.5
-
-        total = size_score + breadth_score + discussion_score + controversy
-        scored.append((total, pr))
-
-    scored.sort(key=lambda x: -x[0])
-    return [pr for _, pr in scored[:top_n]]
+    # Partial top-N selection; ties keep input order, as the full sort did
+    return nlargest(top_n, prs, key=score)
 
 
 def _review_has_content(r) -> bool:
     """Check if a review has any meaningful content (body or line comments)."""
-    return bool(r.body.strip()) or bool(r.review_comments)
+    return bool(r.body and r.body.strip()) or bool(r.review_comments)
 
 
-def get_prs_with_reviews(prs: list[PRData], top_n: int = 20) -> list[PRData]:
+def get_prs_with_reviews(
+    prs: list[PRData],
+    top_n: int = 20,
+    summaries: dict[int, ReviewSummary] | None = None,
+) -> list[PRData]:
     """Filter to PRs that actually have review content."""
-    with_reviews = [
-        pr for pr in prs
-        if any(_review_has_content(r) for r in pr.reviews)
-    ]
-    # Sort by review depth (body length + comment count)
-    with_reviews.sort(
-        key=lambda pr: sum(len(r.body) + len(r.review_comments) * 100 for r in pr.reviews),
-        reverse=True,
-    )
-    return with_reviews[:top_n]
+    if summaries is None:
+        summaries = summarize_reviews(prs)
+    # Deepest reviews first (see ReviewSummary.depth); only the top N are kept
+    depths = [(summaries[pr.number].depth, pr) for pr in prs if summaries[pr.number].has_content]
+    return [pr for _, pr in nlargest(top_n, depths, key=itemgetter(0))]
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import re
 from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import mul
 from typing import Callable
 
 from backend.config import is_excluded_file
@@ -19,13 +22,16 @@ _NOREPLY_RE = re.compile(r'^(?:\d+\+)?(.+)@users\.noreply\.github\.com$', re.IGN
 # Strip GitHub numeric ID prefix from names like "2937652+micsparre"
 _GH_ID_PREFIX_RE = re.compile(r'^\d+\+')
 
-# Heuristic bot detection for git commit authors (complements GraphQL __typename)
-_BOT_NAME_PATTERNS = re.compile(r'\[bot\]|github-actions|dependabot|renovate|greenkeeper|semantic-release', re.IGNORECASE)
+# Heuristic bot detection for git commit authors (complements GraphQL __typename).
+# Plain lowercase substrings — cheaper than a regex on the per-commit hot path.
+_BOT_MARKERS = ("[bot]", "github-actions", "dependabot", "renovate", "greenkeeper", "semantic-release")
 
 
 def is_bot_contributor(name: str, email: str) -> bool:
     """Detect bot contributors from git commit name/email patterns."""
-    return bool(_BOT_NAME_PATTERNS.search(name) or _BOT_NAME_PATTERNS.search(email))
+    name_lower = name.lower()
+    email_lower = email.lower()
+    return any(m in name_lower or m in email_lower for m in _BOT_MARKERS)
 
 
 def build_email_resolver(login_to_email: dict[str, str]) -> Callable[[str], str]:
@@ -35,6 +41,8 @@ def build_email_resolver(login_to_email: dict[str, str]) -> Callable[[str], str]
     for login, email in login_to_email.items():
         cache[login.lower()] = email
 
+    # Distinct author emails are few, so memoize — resolve runs per commit and blame entry
+    @lru_cache(maxsize=None)
     def resolve(email: str) -> str:
         m = _NOREPLY_RE.match(email)
         if m:
@@ -46,6 +54,7 @@ def build_email_resolver(login_to_email: dict[str, str]) -> Callable[[str], str]
     return resolve
 
 
+@lru_cache(maxsize=65536)
 def file_to_module(path: str) -> str:
     """Map file path to logical module (top 2 directory levels)."""
     parts = path.split("/")
@@ -54,50 +63,199 @@ def file_to_module(path: str) -> str:
     return parts[0] if parts else "root"
 
 
-def build_contributor_stats(
+@dataclass(slots=True)
+class _ContributorTotals:
+    name: str
+    is_bot: bool
+    first_commit: str
+    last_commit: str
+    commits: int = 0
+    additions: int = 0
+    deletions: int = 0
+    # Insertion-ordered set of modules touched
+    modules: dict[str, None] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class _ModuleTotals:
+    commits: int = 0
+    additions: int = 0
+    deletions: int = 0
+    blame_lines: int = 0
+
+
+@dataclass
+class CommitAggregates:
+    """Per-author, per-module and per-file totals gathered in one pass over commits.
+
+    Built by ``aggregate_commits``; the stats builders below read from it so the
+    commit list (and each commit's files) is walked only once per analysis.
+    """
+
+    resolve: Callable[[str], str]
+    bot_emails: set[str]
+    by_author: dict[str, _ContributorTotals] = field(default_factory=dict)
+    module_commits: dict[str, int] = field(default_factory=dict)
+    by_module: dict[str, dict[str, _ModuleTotals]] = field(default_factory=dict)
+    file_counts: dict[str, int] = field(default_factory=dict)
+
+    def contributor_stats(self) -> list[ContributorStats]:
+        """Per-contributor statistics, most active first."""
+        stats = [
+            ContributorStats(
+                name=s.name,
+                email=key,
+                is_bot=s.is_bot,
+                total_commits=s.commits,
+                total_additions=s.additions,
+                total_deletions=s.deletions,
+                modules=list(s.modules),
+                first_commit=s.first_commit,
+                last_commit=s.last_commit,
+            )
+            for key, s in self.by_author.items()
+        ]
+        return sorted(stats, key=lambda s: -s.total_commits)
+
+    def module_stats(self, blame_results: list[BlameResult]) -> list[ModuleStats]:
+        """Contributor x module matrix with blame ownership and bus factor."""
+        resolve = self.resolve
+        all_bot_emails = set(self.bot_emails)
+        # Copy commit totals so blame can be layered on without mutating the aggregate
+        by_module = {
+            mod: {a: _ModuleTotals(t.commits, t.additions, t.deletions) for a, t in contributors.items()}
+            for mod, contributors in self.by_module.items()
+        }
+        module_commits = dict(self.module_commits)
+        module_lines: dict[str, int] = {}
+        ownership: dict[str, defaultdict[str, float]] = {}
+
+        # Integrate blame data
+        for br in blame_results:
+            mod = file_to_module(br.file_path)
+            contributors = by_module.get(mod)
+            if contributors is None:
+                contributors = by_module[mod] = {}
+                module_commits[mod] = 0
+            module_lines[mod] = module_lines.get(mod, 0) + br.total_lines
+            owners = ownership.get(mod)
+            if owners is None:
+                owners = ownership[mod] = defaultdict(float)
+            for entry in br.entries:
+                author = resolve(entry.author_email)
+                if is_bot_contributor(entry.author_name, entry.author_email):
+                    all_bot_emails.add(author)
+                cs = contributors.get(author)
+                if cs is None:
+                    cs = contributors[author] = _ModuleTotals()
+                cs.blame_lines += entry.lines
+                pct = entry.lines / br.total_lines if br.total_lines > 0 else 0
+                owners[author] += pct
+
+        # Normalize blame ownership and compute bus factor (excluding bots)
+        modules: list[ModuleStats] = []
+        for mod, contributors in by_module.items():
+            owners = ownership.get(mod, {})
+            total_ownership = sum(owners.values())
+            # Always a plain dict, so the defaultdict doesn't leak into the schema
+            if total_ownership > 0:
+                owners = {k: v / total_ownership for k, v in owners.items()}
+            else:
+                owners = dict(owners)
+            m = ModuleStats(
+                module=mod,
+                contributors={
+                    author: ContributorModuleStats(
+                        commits=cs.commits,
+                        additions=cs.additions,
+                        deletions=cs.deletions,
+                        blame_lines=cs.blame_lines,
+                    )
+                    for author, cs in contributors.items()
+                },
+                total_commits=module_commits[mod],
+                total_lines=module_lines.get(mod, 0),
+                blame_ownership=owners,
+            )
+            m.bus_factor = compute_bus_factor(m, exclude_emails=all_bot_emails)
+            modules.append(m)
+
+        return sorted(modules, key=lambda m: -m.total_commits)
+
+    def most_changed_files(self, top_n: int = 30) -> list[str]:
+        """The N most frequently changed files (for blame analysis)."""
+        # Exclusion is checked once per distinct path rather than per change
+        counts = [(path, n) for path, n in self.file_counts.items() if not is_excluded_file(path)]
+        sorted_files = sorted(counts, key=lambda x: -x[1])
+        return [f for f, _ in sorted_files[:top_n]]
+
+
+def aggregate_commits(
     commits: list[CommitRecord],
     login_to_email: dict[str, str] | None = None,
     bot_emails: set[str] | None = None,
-) -> list[ContributorStats]:
-    """Aggregate per-contributor statistics."""
+) -> CommitAggregates:
+    """Walk commits once, accumulating contributor, module and file totals."""
     resolve = build_email_resolver(login_to_email or {})
     _bot_emails = bot_emails or set()
-    by_author: dict[str, ContributorStats] = {}
+    # Track which emails are bots (from both PR data and commit heuristics)
+    agg = CommitAggregates(resolve=resolve, bot_emails=set(_bot_emails))
+    by_author = agg.by_author
+    by_module = agg.by_module
+    module_commits = agg.module_commits
+    file_counts = agg.file_counts
 
     for c in commits:
         key = resolve(c.author_email)
-        if key not in by_author:
+        is_bot = is_bot_contributor(c.author_name, c.author_email)
+        if is_bot:
+            agg.bot_emails.add(key)
+
+        s = by_author.get(key)
+        if s is None:
             # Use the original name, strip GitHub numeric ID prefix (e.g. "2937652+user" → "user")
             name = _GH_ID_PREFIX_RE.sub('', c.author_name)
-            bot = is_bot_contributor(c.author_name, c.author_email) or key in _bot_emails
-            by_author[key] = ContributorStats(
-                name=name,
-                email=key,
-                is_bot=bot,
-                first_commit=c.date,
-                last_commit=c.date,
-            )
-        else:
+            s = by_author[key] = _ContributorTotals(name, is_bot or key in _bot_emails, c.date, c.date)
+        elif len(c.author_name) > len(s.name) and ' ' in c.author_name:
             # If we already have an entry, prefer longer/more human-readable name
-            existing = by_author[key]
-            if len(c.author_name) > len(existing.name) and ' ' in c.author_name:
-                existing.name = c.author_name
-
-        s = by_author[key]
-        s.total_commits += 1
-        for f in c.files:
-            s.total_additions += f.additions
-            s.total_deletions += f.deletions
-            mod = file_to_module(f.path)
-            if mod not in s.modules:
-                s.modules.append(mod)
+            s.name = c.author_name
 
+        s.commits += 1
         if c.date < s.first_commit:
             s.first_commit = c.date
         if c.date > s.last_commit:
             s.last_commit = c.date
 
-    return sorted(by_author.values(), key=lambda s: -s.total_commits)
+        for f in c.files:
+            s.additions += f.additions
+            s.deletions += f.deletions
+            file_counts[f.path] = file_counts.get(f.path, 0) + 1
+
+            mod = file_to_module(f.path)
+            s.modules[mod] = None
+            contributors = by_module.get(mod)
+            if contributors is None:
+                contributors = by_module[mod] = {}
+                module_commits[mod] = 0
+            module_commits[mod] += 1
+
+            cs = contributors.get(key)
+            if cs is None:
+                cs = contributors[key] = _ModuleTotals()
+            cs.commits += 1
+            cs.additions += f.additions
+            cs.deletions += f.deletions
+
+    return agg
+
+
+def build_contributor_stats(
+    commits: list[CommitRecord],
+    login_to_email: dict[str, str] | None = None,
+    bot_emails: set[str] | None = None,
+) -> list[ContributorStats]:
+    """Aggregate per-contributor statistics."""
+    return aggregate_commits(commits, login_to_email, bot_emails).contributor_stats()
 
 
 def build_module_stats(
@@ -107,59 +265,7 @@ def build_module_stats(
     bot_emails: set[str] | None = None,
 ) -> list[ModuleStats]:
     """Build contributor x module matrix with bus factor."""
-    resolve = build_email_resolver(login_to_email or {})
-    _bot_emails = bot_emails or set()
-    modules: dict[str, ModuleStats] = {}
-
-    # Track which emails are bots (from both PR data and commit heuristics)
-    all_bot_emails: set[str] = set(_bot_emails)
-
-    # Aggregate commit data per module
-    for c in commits:
-        author = resolve(c.author_email)
-        if is_bot_contributor(c.author_name, c.author_email):
-            all_bot_emails.add(author)
-
-        for f in c.files:
-            mod = file_to_module(f.path)
-            if mod not in modules:
-                modules[mod] = ModuleStats(module=mod)
-            m = modules[mod]
-            m.total_commits += 1
-
-            if author not in m.contributors:
-                m.contributors[author] = ContributorModuleStats()
-            cs = m.contributors[author]
-            cs.commits += 1
-            cs.additions += f.additions
-            cs.deletions += f.deletions
-
-    # Integrate blame data
-    for br in blame_results:
-        mod = file_to_module(br.file_path)
-        if mod not in modules:
-            modules[mod] = ModuleStats(module=mod)
-        m = modules[mod]
-        m.total_lines += br.total_lines
-        for entry in br.entries:
-            author = resolve(entry.author_email)
-            if is_bot_contributor(entry.author_name, entry.author_email):
-                all_bot_emails.add(author)
-            if author not in m.contributors:
-                m.contributors[author] = ContributorModuleStats()
-            m.contributors[author].blame_lines += entry.lines
-            pct = entry.lines / br.total_lines if br.total_lines > 0 else 0
-            m.blame_ownership[author] = m.blame_ownership.get(author, 0) + pct
-
-    # Normalize blame ownership and compute bus factor (excluding bots)
-    for m in modules.values():
-        total_ownership = sum(m.blame_ownership.values())
-        if total_ownership > 0:
-            for k in m.blame_ownership:
-                m.blame_ownership[k] /= total_ownership
-        m.bus_factor = compute_bus_factor(m, exclude_emails=all_bot_emails)
-
-    return sorted(modules.values(), key=lambda m: -m.total_commits)
+    return aggregate_commits(commits, login_to_email, bot_emails).module_stats(blame_results)
 
 
 def compute_bus_factor(module: ModuleStats, exclude_emails: set[str] | None = None) -> float:
@@ -177,18 +283,15 @@ def compute_bus_factor(module: ModuleStats, exclude_emails: set[str] | None = No
     else:
         weights = [cs.commits for k, cs in module.contributors.items() if k not in _exclude]
 
-    if not weights or sum(weights) == 0:
-        return 0.0
-
+    total = sum(weights)
     n = len(weights)
-    if n == 1:
+    if n <= 1 or total == 0:
         return 0.0
 
-    total = sum(weights)
-    weights_sorted = sorted(weights)
+    weights.sort()
 
     # Standard Gini coefficient: G = (2 * sum(rank_i * x_i)) / (n * total) - (n+1)/n
-    rank_weighted_sum = sum((i + 1) * w for i, w in enumerate(weights_sorted))
+    rank_weighted_sum = sum(map(mul, range(1, n + 1), weights))
     gini = (2 * rank_weighted_sum) / (n * total) - (n + 1) / n
 
     # Invert: high gini = concentrated = low bus factor (risky)
@@ -198,12 +301,4 @@ def compute_bus_factor(module: ModuleStats, exclude_emails: set[str] | None = No
 
 def get_most_changed_files(commits: list[CommitRecord], top_n: int = 30) -> list[str]:
     """Find the N most frequently changed files (for blame analysis)."""
-    file_counts: dict[str, int] = defaultdict(int)
-    for c in commits:
-        for f in c.files:
-            if is_excluded_file(f.path):
-                continue
-            file_counts[f.path] += 1
-
-    sorted_files = sorted(file_counts.items(), key=lambda x: -x[1])
-    return [f for f, _ in sorted_files[:top_n]]
+    return aggregate_commits(commits).most_changed_files(top_n)
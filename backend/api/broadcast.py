@@ -0,0 +1,55 @@
+"""Per-client outgoing queues for WebSocket progress broadcasts."""
+
+import asyncio
+from collections import deque
+
+from fastapi import WebSocket
+
+# Minimum gap between plain progress updates to one client; updates published
+# in between collapse into the latest
+PROGRESS_INTERVAL = 0.05
+
+
+class ClientQueue:
+    """Outgoing messages for one WebSocket client, drained by its own sender task.
+
+    Publishing never waits on the socket, so a slow client can't hold up the
+    pipeline or other clients. Messages carrying data are always delivered;
+    a plain progress update still waiting to be sent is replaced by a newer
+    one, so a lagging client holds at most one pending update at a time.
+    """
+
+    def __init__(self):
+        self._pending: deque[tuple[bool, str]] = deque()
+        self._ready = asyncio.Event()
+
+    def put(self, payload: str, supersedable: bool = False) -> None:
+        if supersedable and self._pending and self._pending[-1][0]:
+            self._pending[-1] = (True, payload)
+        else:
+            self._pending.append((supersedable, payload))
+        self._ready.set()
+
+    async def get(self) -> tuple[bool, str]:
+        """Next message, as (supersedable, payload)."""
+        while not self._pending:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._pending.popleft()
+
+
+async def send_loop(websocket: WebSocket, queue: ClientQueue) -> None:
+    """Send queued payloads as text frames until the socket fails.
+
+    After a plain progress update the sender pauses for PROGRESS_INTERVAL,
+    so bursts of updates reach the client at display rate rather than at
+    the pipeline's rate.
+    """
+    try:
+        while True:
+            supersedable, payload = await queue.get()
+            await websocket.send_text(payload)
+            if supersedable:
+                await asyncio.sleep(PROGRESS_INTERVAL)
+    except Exception:
+        return
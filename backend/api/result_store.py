@@ -0,0 +1,125 @@
+"""SQLite store for finished analysis results."""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from pydantic_core import from_json
+
+from backend.api.schemas import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    slug TEXT PRIMARY KEY,
+    repo_name TEXT NOT NULL,
+    repo_url TEXT NOT NULL,
+    total_commits INTEGER NOT NULL,
+    total_contributors INTEGER NOT NULL,
+    analysis_months INTEGER NOT NULL,
+    analyzed_at REAL NOT NULL,
+    result_json BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_analyzed_at ON results (analyzed_at DESC);
+"""
+
+_UPSERT = """
+INSERT INTO results (
+    slug, repo_name, repo_url, total_commits, total_contributors,
+    analysis_months, analyzed_at, result_json
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (slug) DO UPDATE SET
+    repo_name = excluded.repo_name,
+    repo_url = excluded.repo_url,
+    total_commits = excluded.total_commits,
+    total_contributors = excluded.total_contributors,
+    analysis_months = excluded.analysis_months,
+    analyzed_at = excluded.analyzed_at,
+    result_json = excluded.result_json
+"""
+
+_SUMMARY_COLUMNS = ("repo_name", "repo_url", "total_commits", "total_contributors", "analysis_months", "analyzed_at")
+
+
+class ResultStore:
+    """Cached results keyed by repo slug, with their list summaries as columns.
+
+    Listing is one indexed query instead of a read per result file. Methods
+    block, so async callers run them via ``asyncio.to_thread``; a lock
+    serializes use of the shared connection across worker threads.
+    """
+
+    def __init__(self, path: str | Path):
+        self._path = Path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def put(self, slug: str, result: AnalysisResult, analyzed_at: float | None = None) -> None:
+        data = result.model_dump(include=set(_SUMMARY_COLUMNS))
+        self._put(slug, result.model_dump_json().encode(), data, analyzed_at)
+
+    def _put(self, slug: str, result_json: bytes, data: dict, analyzed_at: float | None) -> None:
+        row = (
+            slug,
+            data.get("repo_name") or slug,
+            data.get("repo_url", ""),
+            data.get("total_commits", 0),
+            data.get("total_contributors", 0),
+            data.get("analysis_months", 0),
+            analyzed_at if analyzed_at is not None else time.time(),
+            result_json,
+        )
+        with self._lock, self._connect() as conn:
+            conn.execute(_UPSERT, row)
+
+    def get(self, slug: str) -> bytes | None:
+        """The stored result JSON for `slug`, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT result_json FROM results WHERE slug = ?", (slug,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def summaries(self) -> list[dict]:
+        """List summaries of every stored result, most recent first."""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM results ORDER BY analyzed_at DESC"
+            ).fetchall()
+        return [dict(zip(_SUMMARY_COLUMNS, row)) for row in rows]
+
+    def import_files(self, directory: str | Path) -> int:
+        """Move results cached as per-repo JSON files into the store.
+
+        Existing rows win over files. Imported files (and their summary
+        sidecars) are deleted; unreadable ones are left in place.
+        """
+        imported = 0
+        for f in Path(directory).glob("*.json"):
+            if f.name.endswith(".meta.json"):
+                continue
+            try:
+                raw = f.read_bytes()
+                data = from_json(raw)
+                slug = data.get("repo_name") or f.stem.replace("_", "/")
+                if self.get(slug) is None:
+                    self._put(slug, raw, data, f.stat().st_mtime)
+                    imported += 1
+                f.unlink()
+                f.with_name(f.stem + ".meta.json").unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"Could not import cached result {f}: {e}")
+        return imported
@@ -1,14 +1,16 @@
 import asyncio
-import json
 import logging
 import time
 import uuid
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 
 from backend.agents.orchestrator import run_analysis
 from backend.ingestion.clone import repo_slug
+from backend.api.broadcast import ClientQueue, send_loop
+from backend.api.result_store import ResultStore
+from backend.api.wheel_timer import WheelTimer
 from backend.api.schemas import (
     AnalysisResult,
     AnalyzeRequest,
@@ -25,11 +27,31 @@ router = APIRouter(prefix="/api")
 # In-memory job storage
 jobs: dict[str, dict] = {}
 
+# Completed jobs are kept this long (seconds) for late result fetches
+JOB_TTL = 3600
+
 # Global analysis semaphore — caps concurrent pipelines
 _analysis_semaphore = asyncio.Semaphore(MAX_CONCURRENT_ANALYSES)
 
-# Per-IP sliding window rate limiter: {ip: [timestamp, ...]}
-_rate_limits: dict[str, list[float]] = {}
+# Per-IP sliding-window counter: {ip: (window index, count this window, count last window)}
+_rate_limits: dict[str, tuple[int, int, int]] = {}
+
+# When finished jobs and idle rate-limit entries become prunable, so cleanup
+# only visits entries that may have expired
+_job_expiry = WheelTimer(bucket_size=60)
+_rate_limit_expiry = WheelTimer(bucket_size=60)
+
+# Finished results, persisted so they survive refresh/restart
+result_store = ResultStore(Path("cached_results") / "results.sqlite")
+
+# Job status reported while each pipeline stage runs
+_STAGE_TO_STATUS = {
+    1: JobStatus.collecting,
+    2: JobStatus.stats,
+    3: JobStatus.code_analysis,
+    4: JobStatus.review_analysis,
+    5: JobStatus.pattern_detection,
+}
 
 # Track active analysis tasks for graceful shutdown
 _active_tasks: set[asyncio.Task] = set()
@@ -39,39 +61,69 @@ def _get_client_ip(request: Request) -> str:
     """Extract real client IP, respecting X-Forwarded-For from nginx."""
     forwarded = request.headers.get("x-forwarded-for")
     if forwarded:
-        return forwarded.split(",")[0].strip()
+        # First hop is the client; partition avoids building a list of every hop
+        return forwarded.partition(",")[0].strip()
     return request.client.host if request.client else "unknown"
 
 
 def _check_rate_limit(ip: str) -> bool:
-    """Return True if the request is allowed, False if rate-limited."""
-    now = time.time()
-    timestamps = _rate_limits.get(ip, [])
-    # Remove timestamps outside the window
-    timestamps = [t for t in timestamps if now - t < RATE_LIMIT_WINDOW]
-    _rate_limits[ip] = timestamps
-    if len(timestamps) >= RATE_LIMIT_MAX:
+    """Return True if the request is allowed, False if rate-limited.
+
+    Sliding-window counter: the previous fixed window's count, weighted by how
+    much of it still overlaps the sliding window, plus the current count.
+    """
+    # Monotonic clock: wall-clock adjustments can't reset or extend a window
+    now = time.monotonic()
+    window, frac = divmod(now / RATE_LIMIT_WINDOW, 1)
+    window = int(window)
+    if ip not in _rate_limits:
+        _rate_limit_expiry.schedule(ip, _rate_limit_stale_at(window))
+    last_window, curr, prev = _rate_limits.get(ip, (window, 0, 0))
+    if window == last_window + 1:
+        prev, curr = curr, 0
+    elif window != last_window:
+        prev, curr = 0, 0
+    if prev * (1 - frac) + curr >= RATE_LIMIT_MAX:
+        _rate_limits[ip] = (window, curr, prev)
         return False
-    timestamps.append(now)
+    _rate_limits[ip] = (window, curr + 1, prev)
     return True
 
 
+def _rate_limit_stale_at(window: int) -> float:
+    """Time at which an entry last used in `window` has both counts rolled out."""
+    return (window + 2) * RATE_LIMIT_WINDOW
+
+
+def _mark_completed(job_id: str, job: dict) -> None:
+    job["completed_at"] = time.time()
+    _job_expiry.schedule(job_id, job["completed_at"] + JOB_TTL)
+
+
 async def cleanup_old_jobs():
-    """Remove completed jobs older than 1 hour and prune stale rate limit entries."""
+    """Remove completed jobs older than JOB_TTL and prune stale rate limit entries."""
     now = time.time()
     stale_ids = [
-        jid for jid, job in jobs.items()
-        if job.get("completed_at") and now - job["completed_at"] > 3600
+        jid for jid in _job_expiry.fetch(now)
+        if jid in jobs and now - jobs[jid]["completed_at"] > JOB_TTL
     ]
     for jid in stale_ids:
         del jobs[jid]
     if stale_ids:
         logger.info(f"Cleaned up {len(stale_ids)} old jobs")
 
-    # Prune empty rate limit entries
-    empty_ips = [ip for ip, ts in _rate_limits.items() if not ts or now - ts[-1] > RATE_LIMIT_WINDOW]
-    for ip in empty_ips:
-        del _rate_limits[ip]
+    # Prune rate limit entries whose counts have both rolled out of the window;
+    # entries used since they were scheduled are rescheduled instead. Rate
+    # limit windows run on the monotonic clock.
+    now = time.monotonic()
+    for ip in _rate_limit_expiry.fetch(now):
+        if ip not in _rate_limits:
+            continue
+        stale_at = _rate_limit_stale_at(_rate_limits[ip][0])
+        if now >= stale_at:
+            del _rate_limits[ip]
+        else:
+            _rate_limit_expiry.schedule(ip, stale_at)
 
 
 @router.post("/analyze", response_model=AnalyzeResponse)
@@ -92,8 +144,10 @@ async def start_analysis(req: AnalyzeRequest, request: Request):
         "progress": 0.0,
         "result": None,
         "partial_data": None,
-        "ws_clients": [],
+        "ws_queues": set(),
         "completed_at": None,
+        # Serialized state for late-joining WebSocket clients (see _snapshot_payload)
+        "snapshot": None,
     }
 
     # Run analysis in background, track the task
@@ -125,39 +179,54 @@ async def get_results(job_id: str):
     job = jobs[job_id]
     if job["result"] is None:
         return {"error": "Analysis not complete", "status": job["status"]}
-    return job["result"].model_dump()
+    # Serialize straight to JSON rather than via a dict FastAPI would re-encode
+    return Response(content=job["result"].model_dump_json(), media_type="application/json")
 
 
 @router.get("/cached")
 async def list_cached():
     """List all available cached analysis results."""
-    cache_dir = Path("cached_results")
-    if not cache_dir.exists():
-        return []
-    results = []
-    for f in sorted(cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
-        try:
-            data = json.loads(f.read_text())
-            results.append({
-                "repo_name": data.get("repo_name", f.stem.replace("_", "/")),
-                "repo_url": data.get("repo_url", ""),
-                "total_commits": data.get("total_commits", 0),
-                "total_contributors": data.get("total_contributors", 0),
-                "analysis_months": data.get("analysis_months", 0),
-                "analyzed_at": f.stat().st_mtime,
-            })
-        except Exception:
-            continue
-    return results
+    return await asyncio.to_thread(result_store.summaries)
 
 
 @router.get("/cached/{repo_slug:path}")
 async def get_cached(repo_slug: str):
-    """Serve pre-computed results from disk."""
-    cache_path = Path("cached_results") / f"{repo_slug.replace('/', '_')}.json"
-    if not cache_path.exists():
+    """Serve pre-computed results from the result store."""
+    raw = await asyncio.to_thread(result_store.get, repo_slug)
+    if raw is None:
         return {"error": "No cached results for this repo"}
-    return json.loads(cache_path.read_text())
+    # Stored JSON goes out as-is, without a parse/re-serialize round trip
+    return Response(content=raw, media_type="application/json")
+
+
+def _snapshot_payload(job: dict) -> str | None:
+    """The job's current state as a serialized WebSocket message, for clients
+    that connect mid-run or after completion.
+
+    Serialized once and reused by every client connecting before the state
+    next changes (``_run_job`` clears it on each update).
+    """
+    if job["snapshot"] is not None:
+        return job["snapshot"]
+    if job["result"] is not None and job["status"] == JobStatus.complete:
+        msg = WSMessage(
+            type="complete", stage=5, progress=1.0,
+            message="Analysis complete!",
+            data=job["result"].model_dump(),
+        )
+    elif job["stage"] > 0:
+        # Job is in progress — send partial result if available so the graph renders
+        msg = WSMessage(
+            type="partial_result" if job["partial_data"] is not None else "progress",
+            stage=job["stage"],
+            progress=job["progress"],
+            message=job["message"],
+            data=job["partial_data"],
+        )
+    else:
+        return None
+    job["snapshot"] = msg.model_dump_json()
+    return job["snapshot"]
 
 
 @router.websocket("/ws/{job_id}")
@@ -170,38 +239,22 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
         return
 
     job = jobs[job_id]
-    job["ws_clients"].append(websocket)
 
-    # Send current job state immediately so the client isn't stuck on stage 0
     if job["status"] == JobStatus.error:
-        await websocket.send_json(WSMessage(
+        await websocket.send_text(WSMessage(
             type="error", message=job.get("message", "Analysis failed"),
-        ).model_dump())
+        ).model_dump_json())
         await websocket.close()
         return
-    elif job["result"] is not None and job["status"] == JobStatus.complete:
-        await websocket.send_json(WSMessage(
-            type="complete", stage=5, progress=1.0,
-            message="Analysis complete!",
-            data=job["result"].model_dump(),
-        ).model_dump())
-    elif job["stage"] > 0:
-        # Job is in progress — send partial result if available so the graph renders
-        if job["partial_data"] is not None:
-            await websocket.send_json(WSMessage(
-                type="partial_result",
-                stage=job["stage"],
-                progress=job["progress"],
-                message=job["message"],
-                data=job["partial_data"],
-            ).model_dump())
-        else:
-            await websocket.send_json(WSMessage(
-                type="progress",
-                stage=job["stage"],
-                progress=job["progress"],
-                message=job["message"],
-            ).model_dump())
+
+    # Current job state goes first so the client isn't stuck on stage 0;
+    # broadcasts queue up behind it
+    queue = ClientQueue()
+    if (snapshot := _snapshot_payload(job)) is not None:
+        queue.put(snapshot)
+
+    job["ws_queues"].add(queue)
+    sender = asyncio.create_task(send_loop(websocket, queue))
 
     try:
         # Keep connection alive until job completes or client disconnects
@@ -210,16 +263,16 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
                 # Wait for client messages (pings, etc.)
                 await asyncio.wait_for(websocket.receive_text(), timeout=60)
             except asyncio.TimeoutError:
-                # Send keepalive ping
-                try:
-                    await websocket.send_json({"type": "ping"})
-                except Exception:
+                # The sender stops once the socket fails
+                if sender.done():
                     break
+                # Send keepalive ping
+                queue.put('{"type":"ping"}')
     except WebSocketDisconnect:
         pass
     finally:
-        if websocket in job["ws_clients"]:
-            job["ws_clients"].remove(websocket)
+        job["ws_queues"].discard(queue)
+        sender.cancel()
 
 
 async def _run_job(job_id: str, repo_url: str, months: int):
@@ -228,30 +281,20 @@ async def _run_job(job_id: str, repo_url: str, months: int):
 
     async def on_progress(msg: WSMessage):
         # Update job state
-        stage_to_status = {
-            1: JobStatus.collecting,
-            2: JobStatus.stats,
-            3: JobStatus.code_analysis,
-            4: JobStatus.review_analysis,
-            5: JobStatus.pattern_detection,
-        }
-        job["status"] = stage_to_status.get(msg.stage, job["status"])
+        job["status"] = _STAGE_TO_STATUS.get(msg.stage, job["status"])
         job["stage"] = msg.stage
         job["message"] = msg.message
         job["progress"] = msg.progress
+        job["snapshot"] = None
         if msg.data is not None:
-            job["partial_data"] = msg.data
+            # Stage deltas layer onto the snapshot late-joining clients receive
+            job["partial_data"] = {**(job["partial_data"] or {}), **msg.data}
 
-        # Broadcast to WebSocket clients
-        msg_dict = msg.model_dump()
-        dead_clients = []
-        for ws in job["ws_clients"]:
-            try:
-                await ws.send_json(msg_dict)
-            except Exception:
-                dead_clients.append(ws)
-        for ws in dead_clients:
-            job["ws_clients"].remove(ws)
+        # Broadcast to WebSocket clients — serialized once, sent as a text
+        # frame (the frontend JSON.parses text messages) by each client's sender
+        payload = msg.model_dump_json()
+        for queue in job["ws_queues"]:
+            queue.put(payload, supersedable=msg.type == "progress")
 
     try:
         # Wait for semaphore — caps concurrent analyses
@@ -262,16 +305,14 @@ async def _run_job(job_id: str, repo_url: str, months: int):
 
         job["result"] = result
         job["status"] = JobStatus.complete
-        job["completed_at"] = time.time()
+        job["snapshot"] = None
+        _mark_completed(job_id, job)
 
-        # Persist to disk so results survive refresh/restart
+        # Persist so results survive refresh/restart
         try:
-            cache_dir = Path("cached_results")
-            cache_dir.mkdir(exist_ok=True)
-            slug = repo_slug(repo_url)
-            cache_path = cache_dir / f"{slug.replace('/', '_')}.json"
-            cache_path.write_text(json.dumps(result.model_dump(), default=str))
-            logger.info(f"Cached results to {cache_path}")
+            # Serializing and writing a large result would stall the event loop
+            await asyncio.to_thread(result_store.put, repo_slug(repo_url), result)
+            logger.info(f"Cached results for {repo_slug(repo_url)}")
         except Exception as cache_err:
             logger.warning(f"Failed to cache results: {cache_err}")
 
@@ -279,12 +320,9 @@ async def _run_job(job_id: str, repo_url: str, months: int):
         logger.exception(f"Job {job_id} failed")
         job["status"] = JobStatus.error
         job["message"] = str(e)
-        job["completed_at"] = time.time()
+        _mark_completed(job_id, job)
 
         # Notify clients of error
-        error_msg = WSMessage(type="error", message=str(e)).model_dump()
-        for ws in job["ws_clients"]:
-            try:
-                await ws.send_json(error_msg)
-            except Exception:
-                pass
+        error_msg = WSMessage(type="error", message=str(e)).model_dump_json()
+        for queue in job["ws_queues"]:
+            queue.put(error_msg)
@@ -0,0 +1,31 @@
+"""Bucketed expiry schedule for pruning in-memory state."""
+
+import math
+from typing import Hashable
+
+
+class WheelTimer:
+    """Schedule keys for a future time and fetch them once it has passed.
+
+    Keys land in fixed-width time buckets, so fetching touches only the
+    buckets that have come due rather than every tracked key. A key may fire
+    up to one bucket late; callers re-check expiry and reschedule if needed.
+    """
+
+    def __init__(self, bucket_size: float):
+        self._bucket_size = bucket_size
+        self._buckets: dict[int, set[Hashable]] = {}
+
+    def _bucket(self, when: float) -> int:
+        return math.ceil(when / self._bucket_size)
+
+    def schedule(self, key: Hashable, when: float) -> None:
+        self._buckets.setdefault(self._bucket(when), set()).add(key)
+
+    def fetch(self, now: float) -> list[Hashable]:
+        """Remove and return every key whose bucket is due at `now`."""
+        due = int(now // self._bucket_size)
+        keys: list[Hashable] = []
+        for bucket in [b for b in self._buckets if b <= due]:
+            keys.extend(self._buckets.pop(bucket))
+        return keys
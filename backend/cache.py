@@ -0,0 +1,129 @@
+"""Content-addressed caches for expensive async calls, optionally persisted to disk."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from pydantic_core import from_json, to_json
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(*parts: str) -> str:
+    """Hash an ordered sequence of strings into a stable cache key."""
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DiskStore:
+    """JSON-serializable values stored one file per key, expiring after ``ttl`` seconds.
+
+    Unreadable or expired entries count as misses; write errors are logged
+    and ignored, so the disk layer never fails a call.
+    """
+
+    def __init__(self, directory: str | Path, ttl: float):
+        self._dir = Path(directory)
+        self._ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.json"
+
+    def load(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self._ttl:
+                path.unlink(missing_ok=True)
+                return None
+            return from_json(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(to_json(value))
+            # Atomic rename so concurrent readers never see a partial file
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            tmp.unlink(missing_ok=True)
+
+
+class AsyncCache:
+    """LRU cache of awaited results, backed by an optional ``DiskStore``.
+
+    Concurrent misses for the same key share one in-flight call. Failed
+    calls are not cached, so the next caller retries. With a store, misses
+    check disk before calling and successful results are written back, so
+    they survive restarts.
+    """
+
+    def __init__(self, max_size: int = 1024, store: DiskStore | None = None):
+        self._max_size = max_size
+        self._store = store
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str) -> Any | None:
+        """Return a cached value (from memory, then disk) without calling anything."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self._store is None:
+            return None
+        value = await asyncio.to_thread(self._store.load, key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """Cache a value produced outside ``get_or_set`` (e.g. by a batched call)."""
+        self._remember(key, value)
+        if self._store is not None:
+            await asyncio.to_thread(self._store.save, key, value)
+
+    async def get_or_set(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, factory))
+            self._pending[key] = task
+            task.add_done_callback(lambda t: self._settle(key, t))
+        # Shield so one caller's timeout doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if self._store is not None:
+            value = await asyncio.to_thread(self._store.load, key)
+            if value is not None:
+                return value
+        value = await factory()
+        if self._store is not None:
+            await asyncio.to_thread(self._store.save, key, value)
+        return value
+
+    def _settle(self, key: str, task: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._remember(key, task.result())
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
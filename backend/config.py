@@ -1,5 +1,7 @@
 import os
+import re
 import fnmatch
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -71,27 +73,75 @@ EXCLUDED_FILE_PATTERNS: list[str] = [
 ]
 
 
+# Patterns are bucketed once at import: plain "*.ext" patterns and literal
+# names are answered by set lookups, and only the remaining globs are fused
+# into compiled regexes with fnmatch semantics.
+_EXCLUDED_EXTENSIONS = frozenset(
+    p[2:] for p in EXCLUDED_FILE_PATTERNS
+    if p.startswith("*.") and not any(c in p[2:] for c in "*?[./")
+)
+_EXCLUDED_NAMES = frozenset(
+    p for p in EXCLUDED_FILE_PATTERNS if not any(c in p for c in "*?[")
+)
+_EXCLUDED_GLOBS = [
+    p for p in EXCLUDED_FILE_PATTERNS
+    if p not in _EXCLUDED_NAMES and not (p.startswith("*.") and p[2:] in _EXCLUDED_EXTENSIONS)
+]
+# Globs containing "/" can never match a basename, so the basename regex skips them
+_EXCLUDED_RE = re.compile("|".join(fnmatch.translate(p) for p in _EXCLUDED_GLOBS))
+_EXCLUDED_BASENAME_RE = re.compile(
+    "|".join(fnmatch.translate(p) for p in _EXCLUDED_GLOBS if "/" not in p)
+)
+
+
+@lru_cache(maxsize=8192)
 def is_excluded_file(path: str) -> bool:
     """Return True if `path` matches any exclusion pattern."""
-    for pattern in EXCLUDED_FILE_PATTERNS:
-        if fnmatch.fnmatch(path, pattern):
-            return True
-        # Also match against the basename for extension patterns
-        basename = path.rsplit("/", 1)[-1]
-        if fnmatch.fnmatch(basename, pattern):
-            return True
-    return False
+    _, dot, ext = path.rpartition(".")
+    if (dot and ext in _EXCLUDED_EXTENSIONS) or path in _EXCLUDED_NAMES:
+        return True
+    if _EXCLUDED_RE.match(path):
+        return True
+    # Also match against the basename for extension patterns
+    _, sep, basename = path.rpartition("/")
+    return bool(sep) and (
+        basename in _EXCLUDED_NAMES or _EXCLUDED_BASENAME_RE.match(basename) is not None
+    )
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
+# GitHub token for API calls; when unset, the token `gh` is logged in with is used
+GH_TOKEN = os.getenv("GH_TOKEN", "")
+# Concurrent GitHub API requests; rate-limit waits longer than GITHUB_RATE_LIMIT_MAX_WAIT seconds fail instead
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "4"))
+GITHUB_RATE_LIMIT_MAX_WAIT = int(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "120"))
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-opus-4-6")
 CLONE_BASE_DIR = os.getenv("CLONE_BASE_DIR", "/tmp/xray-repos")
 DEFAULT_MONTHS = int(os.getenv("DEFAULT_MONTHS", "6"))
 MAX_CONCURRENT_AI = int(os.getenv("MAX_CONCURRENT_AI", "5"))
+# Code and review analysis overlap, each within its own share of MAX_CONCURRENT_AI
+MAX_CONCURRENT_AI_CODE = int(os.getenv("MAX_CONCURRENT_AI_CODE", str(max(1, MAX_CONCURRENT_AI - MAX_CONCURRENT_AI // 2))))
+MAX_CONCURRENT_AI_REVIEW = int(os.getenv("MAX_CONCURRENT_AI_REVIEW", str(max(1, MAX_CONCURRENT_AI // 2))))
 MAX_PRS_CODE_ANALYSIS = int(os.getenv("MAX_PRS_CODE_ANALYSIS", "30"))
 MAX_PRS_REVIEW_ANALYSIS = int(os.getenv("MAX_PRS_REVIEW_ANALYSIS", "20"))
 MAX_BLAME_FILES = int(os.getenv("MAX_BLAME_FILES", "30"))
+# Parallel `git log --numstat` processes per analysis; each walks history from HEAD
+GIT_LOG_WORKERS = max(1, int(os.getenv("GIT_LOG_WORKERS", str(min(4, os.cpu_count() or 1)))))
 DIFF_TRUNCATE_CHARS = int(os.getenv("DIFF_TRUNCATE_CHARS", "8000"))
+DIFF_TOKEN_BUDGET = int(os.getenv("DIFF_TOKEN_BUDGET", str(DIFF_TRUNCATE_CHARS // 4)))
+# PRs whose diff is under SMALL_DIFF_TOKENS are classified CODE_BATCH_SIZE at a time
+SMALL_DIFF_TOKENS = int(os.getenv("SMALL_DIFF_TOKENS", str(DIFF_TOKEN_BUDGET // 2)))
+CODE_BATCH_SIZE = int(os.getenv("CODE_BATCH_SIZE", "5"))
+CODE_BATCH_TOKEN_BUDGET = int(os.getenv("CODE_BATCH_TOKEN_BUDGET", "12000"))
+# Reviewed PRs classified per request (1 disables batching)
+REVIEW_BATCH_SIZE = max(1, int(os.getenv("REVIEW_BATCH_SIZE", "5")))
 AI_CALL_TIMEOUT = int(os.getenv("AI_CALL_TIMEOUT", "60"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+# Consecutive failed AI calls before further calls fail fast for AI_BREAKER_COOLDOWN seconds
+AI_BREAKER_THRESHOLD = int(os.getenv("AI_BREAKER_THRESHOLD", "5"))
+AI_BREAKER_COOLDOWN = int(os.getenv("AI_BREAKER_COOLDOWN", "30"))
+# Review classifications and blame results persist here across restarts for AI_CACHE_TTL seconds (empty disables)
+AI_CACHE_DIR = os.getenv("AI_CACHE_DIR", "/tmp/xray-cache")
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
 PATTERN_THINKING_BUDGET = int(os.getenv("PATTERN_THINKING_BUDGET", "128000"))
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:5174,http://localhost:3000").split(",")
 
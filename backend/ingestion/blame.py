@@ -1,18 +1,24 @@
 import asyncio
-from collections import defaultdict
+import os
+from operator import itemgetter
 from pathlib import Path
 
 from backend.api.schemas import BlameEntry, BlameResult
+from backend.cache import AsyncCache, DiskStore, content_key
+from backend.config import AI_CACHE_DIR, AI_CACHE_TTL
+from backend.ingestion.clone import shallow_commits
 
+# Parsed blame keyed by (HEAD commit, path): blame at a given commit never
+# changes once the full history is present, so re-analyzing an unchanged repo
+# skips the blame processes
+_cache = AsyncCache(store=DiskStore(os.path.join(AI_CACHE_DIR, "blame"), AI_CACHE_TTL) if AI_CACHE_DIR else None)
 
-async def get_blame(repo_path: Path, file_path: str) -> BlameResult | None:
-    """Run git blame --line-porcelain on a file, aggregate by author."""
-    full_path = repo_path / file_path
-    if not full_path.exists():
-        return None
 
+async def get_blame(repo_path: Path, file_path: str) -> BlameResult | None:
+    """Run git blame --incremental on a file, aggregate by author."""
+    # No existence check: a missing file just makes blame exit nonzero
     proc = await asyncio.create_subprocess_exec(
-        "git", "-C", str(repo_path), "blame", "--line-porcelain", file_path,
+        "git", "-C", str(repo_path), "blame", "--incremental", "--", file_path,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
@@ -21,31 +27,102 @@ async def get_blame(repo_path: Path, file_path: str) -> BlameResult | None:
     if proc.returncode != 0:
         return None
 
-    raw = stdout.decode(errors="replace")
-    author_lines: dict[tuple[str, str], int] = defaultdict(int)
-    current_author = ""
-    current_email = ""
+    # --incremental reports blame as line groups, "<sha> <orig> <final> <count>",
+    # each closed by a "filename" line, so the file's content is never sent
+    # and parsing is per group rather than per line. Commit details follow a
+    # group header only the first time that commit appears.
+    sha_lines: dict[bytes, int] = {}
+    sha_first_line: dict[bytes, int] = {}
+    sha_to_author: dict[bytes, tuple[bytes, bytes]] = {}
+    current_sha = b""
+    current_author = b""
+    expect_header = True
     total_lines = 0
 
-    for line in raw.splitlines():
-        if line.startswith("author "):
+    for line in stdout.split(b"\n"):
+        if expect_header:
+            if not line:
+                break
+            current_sha, _, final, count = line.split(b" ")
+            n = int(count)
+            sha_lines[current_sha] = sha_lines.get(current_sha, 0) + n
+            first = int(final)
+            sha_first_line[current_sha] = min(sha_first_line.get(current_sha, first), first)
+            total_lines += n
+            expect_header = False
+        elif line.startswith(b"filename "):
+            expect_header = True
+        elif line.startswith(b"author "):
             current_author = line[7:]
-        elif line.startswith("author-mail "):
-            current_email = line[12:].strip("<>")
-        elif line.startswith("\t"):
-            author_lines[(current_author, current_email)] += 1
-            total_lines += 1
+        elif line.startswith(b"author-mail "):
+            sha_to_author[current_sha] = (current_author, line[12:].strip(b"<>"))
+
+    # Fold into authors, decoding once per distinct author. Groups arrive in
+    # blame order, so commits are visited by first line in the file; the
+    # stable sort then breaks ties by the author's first line.
+    author_lines: dict[tuple[bytes, bytes], int] = {}
+    for sha in sorted(sha_lines, key=sha_first_line.__getitem__):
+        key = sha_to_author.get(sha, (b"", b""))
+        author_lines[key] = author_lines.get(key, 0) + sha_lines[sha]
 
     entries = [
-        BlameEntry(author_name=name, author_email=email, lines=count)
-        for (name, email), count in sorted(author_lines.items(), key=lambda x: -x[1])
+        BlameEntry(
+            author_name=name.decode(errors="replace"),
+            author_email=email.decode(errors="replace"),
+            lines=count,
+        )
+        for (name, email), count in sorted(author_lines.items(), key=itemgetter(1), reverse=True)
     ]
 
     return BlameResult(file_path=file_path, entries=entries, total_lines=total_lines)
 
 
+async def _head_commit(repo_path: Path) -> str | None:
+    proc = await asyncio.create_subprocess_exec(
+        "git", "-C", str(repo_path), "rev-parse", "HEAD",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await proc.communicate()
+    return stdout.decode().strip() if proc.returncode == 0 else None
+
+
+async def _cached_blame(repo_path: Path, head: str | None, file_path: str) -> BlameResult | None:
+    if head is None:
+        return await get_blame(repo_path, file_path)
+
+    async def blame_data() -> dict | None:
+        result = await get_blame(repo_path, file_path)
+        return result.model_dump() if result else None
+
+    data = await _cache.get_or_set(content_key(head, file_path), blame_data)
+    return BlameResult.model_validate(data) if data else None
+
+
 async def get_blame_for_files(repo_path: Path, file_paths: list[str]) -> list[BlameResult]:
-    """Run blame on multiple files concurrently."""
-    tasks = [get_blame(repo_path, fp) for fp in file_paths]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    return [r for r in results if isinstance(r, BlameResult)]
+    """Run blame on multiple files with a bounded pool of workers.
+
+    git blame takes a single path per invocation, so each file still costs
+    one process; a fixed pool of workers pulling from a queue keeps at most
+    one blame per CPU running instead of launching every file at once.
+    Results are cached per HEAD commit, but only for complete histories: in
+    a shallow clone, blame credits older lines to the shallow-edge commits.
+    """
+    head = None if shallow_commits(repo_path) else await _head_commit(repo_path)
+    queue: asyncio.Queue[tuple[int, str]] = asyncio.Queue()
+    for item in enumerate(file_paths):
+        queue.put_nowait(item)
+    results: list[BlameResult | None] = [None] * len(file_paths)
+
+    async def worker():
+        while not queue.empty():
+            i, fp = queue.get_nowait()
+            try:
+                results[i] = await _cached_blame(repo_path, head, fp)
+            except Exception:
+                continue
+
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(min(os.cpu_count() or 4, len(file_paths))):
+            tg.create_task(worker())
+    return [r for r in results if r is not None]
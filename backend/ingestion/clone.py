@@ -4,6 +4,7 @@ import asyncio
 import os
 import re
 import shutil
+from functools import lru_cache
 from pathlib import Path
 from typing import Callable, Awaitable
 
@@ -15,12 +16,21 @@ logger = logging.getLogger(__name__)
 
 ProgressCallback = Callable[[str], Awaitable[None]]
 
-# Matches git progress lines like "Receiving objects:  45% (12345/27000), 150.00 MiB | 5.00 MiB/s"
+# Background fetches completing the history of shallow clones, by clone path
+_history_fetches: dict[Path, asyncio.Task] = {}
+
+# Matches git progress lines like "Receiving objects:  45% (12345/27000), 150.00 MiB | 5.00 MiB/s";
+# the phase group excludes any "remote: " prefix
 _PROGRESS_RE = re.compile(
-    r'(Receiving objects|Resolving deltas|Counting objects|Compressing objects|remote: Counting objects|remote: Compressing objects):\s+(\d+)%'
+    rb'(?:remote: )?(Receiving objects|Resolving deltas|Counting objects|Compressing objects):\s+(\d+)%'
 )
+# Git uses \r to overwrite progress lines, \n for final lines
+_LINE_BREAK_RE = re.compile(rb'[\r\n]')
+# git's error when --shallow-since excludes every commit
+_NO_SHALLOW_COMMITS = "no commits selected for shallow requests"
 
 
+@lru_cache(maxsize=1024)
 def repo_slug(repo_url: str) -> str:
     """Extract 'owner/repo' from a GitHub URL."""
     url = repo_url.strip().rstrip("/").removesuffix(".git")
@@ -30,6 +40,7 @@ def repo_slug(repo_url: str) -> str:
     return f"{parts[-2]}/{parts[-1]}"
 
 
+@lru_cache(maxsize=1024)
 def repo_local_path(repo_url: str) -> Path:
     slug = repo_slug(repo_url)
     return Path(CLONE_BASE_DIR) / slug.replace("/", "_")
@@ -66,8 +77,14 @@ async def clone_repo(
     repo_url: str,
     force: bool = False,
     on_progress: ProgressCallback | None = None,
+    history_months: int | None = None,
 ) -> Path:
-    """Clone a repo (full clone so git log/blame don't trigger lazy fetches)."""
+    """Clone a repo (full clone so git log/blame don't trigger lazy fetches).
+
+    With ``history_months``, only that much history is cloned up front and
+    the rest is fetched in the background; call ``wait_for_history`` before
+    anything that needs older commits, such as blame.
+    """
     dest = repo_local_path(repo_url)
 
     if dest.exists() and not force:
@@ -99,8 +116,37 @@ async def clone_repo(
 
     os.makedirs(dest.parent, exist_ok=True)
 
+    shallow_args = (
+        [f"--shallow-since={history_months} months ago", "--no-single-branch"]
+        if history_months else []
+    )
+    returncode, stderr = await _run_clone(repo_url, dest, shallow_args, on_progress)
+    if returncode != 0 and shallow_args and _NO_SHALLOW_COMMITS in stderr:
+        # Nothing was committed in the window; a full clone lets the caller
+        # report that instead of failing on git's error
+        shutil.rmtree(dest, ignore_errors=True)
+        shallow_args = []
+        returncode, stderr = await _run_clone(repo_url, dest, shallow_args, on_progress)
+    if returncode != 0:
+        raise RuntimeError(f"git clone failed: {stderr}")
+
+    if shallow_args:
+        task = asyncio.create_task(_fetch_history(dest))
+        _history_fetches[dest] = task
+        task.add_done_callback(lambda _: _history_fetches.pop(dest, None))
+
+    return dest
+
+
+async def _run_clone(
+    repo_url: str,
+    dest: Path,
+    extra_args: list[str],
+    on_progress: ProgressCallback | None,
+) -> tuple[int, str]:
+    """Run ``git clone``, reporting its progress; returns the exit code and stderr."""
     proc = await asyncio.create_subprocess_exec(
-        "git", "clone", "--progress", repo_url, str(dest),
+        "git", "clone", "--progress", *extra_args, repo_url, str(dest),
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
@@ -114,33 +160,57 @@ async def clone_repo(
             if not chunk:
                 break
             stderr_chunks.append(chunk)
-            buf += chunk
-            # Git uses \r to overwrite progress lines, \n for final lines
-            while b"\r" in buf or b"\n" in buf:
-                # Split on whichever delimiter comes first
-                cr = buf.find(b"\r")
-                nl = buf.find(b"\n")
-                if cr == -1:
-                    idx, skip = nl, 1
-                elif nl == -1:
-                    idx, skip = cr, 1
-                else:
-                    idx, skip = min(cr, nl), 1
-                line = buf[:idx].decode(errors="replace").strip()
-                buf = buf[idx + skip:]
-                if line:
-                    m = _PROGRESS_RE.search(line)
-                    if m:
-                        phase = m.group(1).replace("remote: ", "")
-                        pct = m.group(2)
-                        await on_progress(f"{phase}: {pct}%")
+            # The last piece is an unfinished line, carried into the next chunk
+            *lines, buf = _LINE_BREAK_RE.split(buf + chunk)
+            for line in lines:
+                # Match on bytes; only progress lines get decoded
+                if m := _PROGRESS_RE.search(line):
+                    phase, pct = m.groups()
+                    await on_progress(f"{phase.decode()}: {pct.decode()}%")
         await proc.wait()
     else:
         _, stderr_data = await proc.communicate()
         stderr_chunks.append(stderr_data)
 
+    return proc.returncode, b"".join(stderr_chunks).decode(errors="replace")
+
+
+async def _fetch_history(dest: Path) -> None:
+    """Complete a shallow clone's history. Failures are logged, not raised."""
+    proc = await asyncio.create_subprocess_exec(
+        "git", "-C", str(dest), "fetch", "--unshallow", "--quiet",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+        raise
     if proc.returncode != 0:
-        full_stderr = b"".join(stderr_chunks).decode(errors="replace")
-        raise RuntimeError(f"git clone failed: {full_stderr}")
+        logger.warning(f"Fetching full history failed: {stderr.decode(errors='replace').strip()}")
 
-    return dest
+
+def shallow_commits(repo_path: Path) -> set[str]:
+    """Hashes of the commits at a shallow clone's edge, whose parents are missing."""
+    try:
+        return set((repo_path / ".git" / "shallow").read_text().split())
+    except OSError:
+        return set()
+
+
+async def wait_for_history(repo_path: Path) -> None:
+    """Wait for a background history fetch started by ``clone_repo``, if any."""
+    task = _history_fetches.get(repo_path)
+    if task is not None:
+        await asyncio.shield(task)
+
+
+async def cancel_history_fetch(repo_path: Path) -> None:
+    """Stop a background history fetch, e.g. before deleting the clone."""
+    task = _history_fetches.pop(repo_path, None)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -1,14 +1,21 @@
 import asyncio
+import itertools
 import re
+import time
 from pathlib import Path
 
 from backend.api.schemas import CommitRecord, FileChange
-from backend.config import is_excluded_file
+from backend.config import GIT_LOG_WORKERS, is_excluded_file
 
 # Matches git rename notation: prefix/{old => new}/suffix or {old => new}/suffix
 _RENAME_RE = re.compile(r'\{[^}]*\s+=>\s+[^}]*\}')
+_SLASHES_RE = re.compile(r'/+')
 
 COMMIT_START = "---XRAY_COMMIT---"
+_COMMIT_START_B = COMMIT_START.encode()
+
+# "<additions>\t<deletions>\t<path>"; binary files report "-" counts
+_NUMSTAT_RE = re.compile(rb"(\d+|-)\t(\d+|-)\t(.+)")
 
 
 def _resolve_rename(path: str) -> str:
@@ -17,6 +24,10 @@ def _resolve_rename(path: str) -> str:
     e.g. 'libs/{sql-babel => query-parser}/index.ts' -> 'libs/query-parser/index.ts'
          '{old => new}/foo.py' -> 'new/foo.py'
     """
+    # Rename notation always has a brace; most paths return here
+    if "{" not in path:
+        return path
+
     def _replace(m: re.Match) -> str:
         inner = m.group(0)[1:-1]  # strip { }
         _, new = inner.split("=>", 1)
@@ -24,18 +35,53 @@ def _resolve_rename(path: str) -> str:
 
     resolved = _RENAME_RE.sub(_replace, path)
     # Clean up any double slashes from empty segments (e.g. "{ => new}" at start)
-    return re.sub(r'/+', '/', resolved).strip('/')
+    return _SLASHES_RE.sub('/', resolved).strip('/')
 
 
 FORMAT = f"{COMMIT_START}%n%H%n%an%n%ae%n%aI%n%s"
+# Lines FORMAT emits after the start marker: hash, author, email, date, subject
+_HEADER_FIELDS = 5
+
+_MAX_LINE = 1 << 20
+
+
+async def get_commits(repo_path: Path, months: int = 6, workers: int | None = None) -> list[CommitRecord]:
+    """Parse git log --numstat output into CommitRecord objects, newest first.
+
+    Computing numstat dominates on large repos, so the window is split into
+    date ranges (GIT_LOG_WORKERS by default), each logged by its own git
+    process. The ranges are concatenated newest first, and commits that fall
+    on a shared boundary are kept once.
+    """
+    workers = max(1, workers or GIT_LOG_WORKERS)
+    now = int(time.time())
+    # The oldest range keeps git's own "N months ago" cutoff; the inner
+    # boundaries split an approximate window of 30-day months evenly
+    span = months * 30 * 24 * 3600
+    bounds = [f"@{now - span * k // workers}" for k in range(1, workers)]
+    since = [*bounds, f"{months} months ago"]
+    until = [None, *bounds]
+
+    ranges = await asyncio.gather(*(
+        _log_range(repo_path, s, u) for s, u in zip(since, until)
+    ))
+    if len(ranges) == 1:
+        return ranges[0]
+    commits: list[CommitRecord] = []
+    seen: set[str] = set()
+    for commit in itertools.chain.from_iterable(ranges):
+        if commit.hash not in seen:
+            seen.add(commit.hash)
+            commits.append(commit)
+    return commits
 
 
-async def get_commits(repo_path: Path, months: int = 6) -> list[CommitRecord]:
-    """Parse git log --numstat output into CommitRecord objects."""
+async def _log_range(repo_path: Path, since: str, until: str | None) -> list[CommitRecord]:
     cmd = [
         "git", "-C", str(repo_path),
         "log",
-        f"--since={months} months ago",
+        f"--since={since}",
+        *([f"--until={until}"] if until else []),
         f"--format={FORMAT}",
         "--numstat",
     ]
@@ -43,51 +89,50 @@ async def get_commits(repo_path: Path, months: int = 6) -> list[CommitRecord]:
     proc = await asyncio.create_subprocess_exec(
         *cmd,
         stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        # Room for very long subject lines and paths
+        limit=_MAX_LINE,
     )
-    stdout, _ = await proc.communicate()
-    raw = stdout.decode(errors="replace")
 
     commits: list[CommitRecord] = []
-    # Split on start marker — first element is empty/pre-header junk
-    blocks = raw.split(COMMIT_START)
-
-    for block in blocks:
-        lines = block.strip().splitlines()
-        if len(lines) < 5:
+    # Parse as git writes: each commit is built line by line, so the full log
+    # is never held in memory. `header` collects the fields after a marker.
+    header: list[str] = []
+    files: list[FileChange] = []
+    in_commit = False
+
+    def finish_commit():
+        if in_commit and len(header) == _HEADER_FIELDS:
+            hash_val, author_name, author_email, date, message = header
+            commits.append(CommitRecord(
+                hash=hash_val,
+                author_name=author_name,
+                author_email=author_email,
+                date=date,
+                message=message,
+                files=files,
+            ))
+
+    async for raw in proc.stdout:
+        line = raw.strip()
+        if line == _COMMIT_START_B:
+            finish_commit()
+            header, files, in_commit = [], [], True
+        elif not in_commit:
             continue
-
-        hash_val = lines[0].strip()
-        author_name = lines[1].strip()
-        author_email = lines[2].strip()
-        date = lines[3].strip()
-        message = lines[4].strip()
-
-        files: list[FileChange] = []
-        for line in lines[5:]:
-            line = line.strip()
-            if not line:
+        elif len(header) < _HEADER_FIELDS:
+            header.append(line.decode(errors="replace"))
+        elif m := _NUMSTAT_RE.match(line):
+            add_b, del_b, path_b = m.groups()
+            path = _resolve_rename(path_b.decode(errors="replace"))
+            if is_excluded_file(path):
                 continue
-            parts = line.split("\t")
-            if len(parts) >= 3:
-                add_str, del_str, path = parts[0], parts[1], parts[2]
-                try:
-                    additions = int(add_str) if add_str != "-" else 0
-                    deletions = int(del_str) if del_str != "-" else 0
-                except ValueError:
-                    continue
-                path = _resolve_rename(path)
-                if is_excluded_file(path):
-                    continue
-                files.append(FileChange(additions=additions, deletions=deletions, path=path))
-
-        commits.append(CommitRecord(
-            hash=hash_val,
-            author_name=author_name,
-            author_email=author_email,
-            date=date,
-            message=message,
-            files=files,
-        ))
+            files.append(FileChange(
+                additions=0 if add_b == b"-" else int(add_b),
+                deletions=0 if del_b == b"-" else int(del_b),
+                path=path,
+            ))
+    finish_commit()
+    await proc.wait()
 
     return commits
@@ -1,42 +1,227 @@
 import asyncio
+import os
+from collections import deque
 from pathlib import Path
+from typing import AsyncIterator
 
-from backend.config import DIFF_TRUNCATE_CHARS
+from backend.config import DIFF_TOKEN_BUDGET, is_excluded_file
+
+# Cheap token estimate — close enough for budgeting prompt size
+CHARS_PER_TOKEN = 4
+
+# Never buffer more than this much git output per diff, however large the commit
+_READ_LIMIT = DIFF_TOKEN_BUDGET * CHARS_PER_TOKEN * 16
+
+_FILE_BOUNDARY = "\ndiff --git "
+
+
+def truncate_diff(diff: str, max_tokens: int = DIFF_TOKEN_BUDGET) -> str:
+    """Fit a diff into a token budget, sharing it fairly across files.
+
+    Drops sections for excluded files (lockfiles, images, minified assets),
+    then gives every remaining section an equal share of the budget; sections
+    smaller than their share hand the leftover on to the larger ones.
+    """
+    head, *files = ("\n" + diff).split(_FILE_BOUNDARY)
+    sections = [head[1:]] if head[1:] else []
+    for f in files:
+        path = f.split("\n", 1)[0].split(" b/", 1)[-1]
+        if not is_excluded_file(path):
+            sections.append(_FILE_BOUNDARY[1:] + f)
+    if not sections:
+        return ""
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    if sum(len(s) for s in sections) + len(sections) <= budget:
+        return "\n".join(sections)
+
+    alloc = [0] * len(sections)
+    remaining = budget
+    by_size = sorted(range(len(sections)), key=lambda i: len(sections[i]))
+    for n, i in enumerate(by_size):
+        share = remaining // (len(sections) - n)
+        alloc[i] = min(len(sections[i]), share)
+        remaining -= alloc[i]
+
+    parts = []
+    for section, size in zip(sections, alloc):
+        if size == len(section):
+            parts.append(section)
+        elif size > 0:
+            parts.append(section[:size] + "\n... [truncated]")
+    return "\n".join(parts)
+
+
+async def _read_git_output(*args: str) -> str:
+    """Run a git command, reading at most _READ_LIMIT bytes of its stdout."""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    chunks: list[bytes] = []
+    size = 0
+    while size < _READ_LIMIT:
+        chunk = await proc.stdout.read(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    await proc.wait()
+    return b"".join(chunks)[:_READ_LIMIT].decode(errors="replace")
 
 
 async def get_diff_for_commit(repo_path: Path, commit_hash: str) -> str:
     """Get the diff for a specific commit, truncated to stay within token budget."""
-    proc = await asyncio.create_subprocess_exec(
+    diff = await _read_git_output(
         "git", "-C", str(repo_path), "show", "--format=", "--stat", "--patch", commit_hash,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
     )
-    stdout, _ = await proc.communicate()
-    diff = stdout.decode(errors="replace")
-    if len(diff) > DIFF_TRUNCATE_CHARS:
-        diff = diff[:DIFF_TRUNCATE_CHARS] + "\n... [truncated]"
-    return diff
+    return truncate_diff(diff)
+
+
+# diff-tree echoes non-commit input lines verbatim, so writing this after each
+# commit marks where that commit's diff ends
+_END_LINE = b"xray-diff-end\n"
+_END_MARK = b"\n" + _END_LINE
+
+# Matches `git show --format= --stat --patch` output: rename detection and
+# combined diffs for merges are porcelain defaults that diff-tree lacks
+_DIFF_TREE_ARGS = ("diff-tree", "--stdin", "-M", "--root", "--no-commit-id", "--stat", "--patch", "--cc")
+
+
+class DiffBatcher:
+    """Diffs for many commits of one repo from a single ``git diff-tree --stdin``.
+
+    Use as an async context manager. Requests are pipelined: each commit is
+    written to git's stdin as soon as it's asked for, and one reader task
+    hands responses back in order, so N diffs cost one process instead of N.
+    If the batch process is unavailable, diffs fall back to ``git show``.
+    """
+
+    def __init__(self, repo_path: Path):
+        self._repo_path = repo_path
+        self._proc: asyncio.subprocess.Process | None = None
+        self._reader: asyncio.Task | None = None
+        self._waiters: deque[asyncio.Future[bytes]] = deque()
+
+    async def __aenter__(self) -> "DiffBatcher":
+        try:
+            self._proc = await asyncio.create_subprocess_exec(
+                "git", "-C", str(self._repo_path), *_DIFF_TREE_ARGS,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except OSError:
+            return self
+        self._reader = asyncio.create_task(self._read_responses())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._proc is None:
+            return
+        self._proc.stdin.close()
+        if self._proc.returncode is None:
+            try:
+                self._proc.kill()
+            except ProcessLookupError:
+                pass
+        await self._proc.wait()
+        self._reader.cancel()
+        self._fail_waiters()
+
+    async def diff(self, commit_hash: str) -> str:
+        """The commit's diff, truncated to stay within the token budget."""
+        if self._reader is None or self._reader.done() or not _is_hex(commit_hash):
+            return await get_diff_for_commit(self._repo_path, commit_hash)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            self._proc.stdin.write(commit_hash.encode() + b"\n" + _END_LINE)
+            await self._proc.stdin.drain()
+            raw = await waiter
+        except (OSError, RuntimeError):
+            return await get_diff_for_commit(self._repo_path, commit_hash)
+        return truncate_diff(raw.decode(errors="replace"))
+
+    async def _read_responses(self) -> None:
+        """Split git's output at end markers and resolve waiters in order.
+
+        Only the first _READ_LIMIT bytes of each response are kept.
+        """
+        stdout = self._proc.stdout
+        # A leading newline lets an empty response's marker match like the rest
+        buf = bytearray(b"\n")
+        kept: bytes | None = None  # head of a response that outgrew _READ_LIMIT
+        try:
+            while True:
+                end = buf.find(_END_MARK)
+                if end == -1:
+                    if len(buf) > _READ_LIMIT + len(_END_MARK):
+                        if kept is None:
+                            kept = bytes(buf[1:_READ_LIMIT + 1])
+                        # Keep just enough of the tail to find a marker spanning chunks
+                        del buf[:-len(_END_MARK)]
+                    chunk = await stdout.read(65536)
+                    if not chunk:
+                        return
+                    buf += chunk
+                    continue
+                response = kept if kept is not None else bytes(buf[1:end + 1])
+                kept = None
+                # The marker's trailing newline becomes the next leading one
+                del buf[:end + len(_END_MARK) - 1]
+                if self._waiters:
+                    waiter = self._waiters.popleft()
+                    if not waiter.done():
+                        waiter.set_result(response[:_READ_LIMIT])
+        finally:
+            self._fail_waiters()
+
+    def _fail_waiters(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("git diff-tree exited"))
+
+
+def _is_hex(s: str) -> bool:
+    return bool(s) and all(c in "0123456789abcdefABCDEF" for c in s)
 
 
 async def get_pr_diff(repo_path: Path, base_ref: str, head_ref: str) -> str:
     """Get diff between two refs (for PR analysis)."""
-    proc = await asyncio.create_subprocess_exec(
+    diff = await _read_git_output(
         "git", "-C", str(repo_path), "diff", f"{base_ref}...{head_ref}",
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
     )
-    stdout, _ = await proc.communicate()
-    diff = stdout.decode(errors="replace")
-    if len(diff) > DIFF_TRUNCATE_CHARS:
-        diff = diff[:DIFF_TRUNCATE_CHARS] + "\n... [truncated]"
-    return diff
-
-
-async def get_diffs_for_prs(repo_path: Path, merge_commits: list[str]) -> dict[str, str]:
-    """Get diffs for multiple merge commits. Returns {commit_hash: diff}."""
-    tasks = {h: get_diff_for_commit(repo_path, h) for h in merge_commits}
-    results = {}
-    for h, task in zip(tasks.keys(), await asyncio.gather(*tasks.values(), return_exceptions=True)):
-        if isinstance(task, str):
-            results[h] = task
-    return results
+    return truncate_diff(diff)
+
+
+async def get_diffs_for_prs(repo_path: Path, merge_commits: list[str]) -> AsyncIterator[tuple[str, str]]:
+    """Yield (commit_hash, diff) for multiple merge commits as each diff completes.
+
+    A slow commit doesn't hold back the others, and at most two git
+    processes per CPU run at once. Commits whose diff fails are skipped.
+    """
+    sem = asyncio.Semaphore((os.cpu_count() or 4) * 2)
+
+    async def fetch(h: str) -> tuple[str, str]:
+        async with sem:
+            return h, await get_diff_for_commit(repo_path, h)
+
+    tasks = [asyncio.create_task(fetch(h)) for h in merge_commits]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                yield await next_done
+            except Exception:
+                continue
+    finally:
+        # The consumer may stop early; don't leave git processes running
+        for task in tasks:
+            task.cancel()
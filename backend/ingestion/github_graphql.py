@@ -1,22 +1,112 @@
 import asyncio
-import json
 import logging
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import AsyncIterator
+
+import httpx
+from pydantic_core import from_json
 
 from backend.api.schemas import PRData, PRReview
+from backend.config import GH_TOKEN, GITHUB_MAX_CONCURRENCY, GITHUB_RATE_LIMIT_MAX_WAIT
 from backend.ingestion.clone import repo_slug
 
 logger = logging.getLogger(__name__)
 
 PAGE_SIZE = 100  # GitHub GraphQL max per page
+DETAIL_BATCH_SIZE = 25  # PRs per detail query, well inside GraphQL node limits
+REST_FALLBACK_LIMIT = 1000  # Same cap as the GraphQL path: 10 pages × 100
+
+# Lists merged PRs with just enough to apply the date cutoff
+_PR_LIST_QUERY = """
+query($owner: String!, $name: String!, $limit: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: $limit, states: MERGED, orderBy: {field: UPDATED_AT, direction: DESC}, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { number mergedAt }
+    }
+  }
+}
+""".strip()
+
+# Everything _parse_node reads from a PR; see _detail_query
+_PR_FIELDS_FRAGMENT = """
+fragment PRFields on PullRequest {
+  number
+  title
+  author { login __typename }
+  commits(last: 1) {
+    nodes { commit { author { email } } }
+  }
+  createdAt
+  mergedAt
+  additions
+  deletions
+  changedFiles
+  body
+  comments { totalCount }
+  files(first: 50) @include(if: $withFiles) { nodes { path } }
+  reviews(first: 20) @include(if: $withReviews) {
+    nodes {
+      author { login __typename }
+      state
+      body
+      comments(first: 30) {
+        nodes { body }
+      }
+    }
+  }
+}
+""".strip()
 
+GRAPHQL_URL = "https://api.github.com/graphql"
 
+# Shared GitHub client — one keep-alive connection pool for every page and job
+_client: httpx.AsyncClient | None = None
+_client_lock = asyncio.Lock()
+# Caps in-flight requests across all jobs; GitHub's secondary rate limits punish bursts
+_request_slots = asyncio.Semaphore(GITHUB_MAX_CONCURRENCY)
+
+
+async def _gh_cli_token() -> str:
+    """The token the gh CLI is logged in with, or "" if it isn't."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "gh", "auth", "token",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError:
+        return ""
+    stdout, _ = await proc.communicate()
+    return stdout.decode().strip() if proc.returncode == 0 else ""
+
+
+async def get_github_client() -> httpx.AsyncClient | None:
+    """The shared GraphQL client, or None when no GitHub token is available."""
+    global _client
+    if _client is None:
+        async with _client_lock:
+            if _client is None:
+                token = GH_TOKEN or await _gh_cli_token()
+                if not token:
+                    return None
+                _client = httpx.AsyncClient(
+                    headers={"Authorization": f"bearer {token}", "User-Agent": "xray"},
+                    timeout=httpx.Timeout(60.0, connect=5.0),
+                )
+    return _client
+
+
+@lru_cache(maxsize=4096)
 def _parse_dt(s: str) -> datetime | None:
     """Parse an ISO 8601 datetime string from GitHub."""
     if not s:
         return None
     try:
-        return datetime.fromisoformat(s.replace("Z", "+00:00"))
+        # fromisoformat accepts GitHub's trailing "Z" as UTC since Python 3.11
+        return datetime.fromisoformat(s)
     except ValueError:
         return None
 
@@ -29,8 +119,11 @@ def _is_bot_typename(author: dict | None) -> bool:
 
 
 def _is_bot_login(login: str) -> bool:
-    """Fallback bot detection by login name pattern."""
-    return "[bot]" in login.lower()
+    """Fallback bot detection by login name pattern.
+
+    GitHub App logins always end in "[bot]" exactly, so no case folding is needed.
+    """
+    return login.endswith("[bot]")
 
 
 def _merge_reviews(reviews: list[PRReview]) -> list[PRReview]:
@@ -38,52 +131,57 @@ def _merge_reviews(reviews: list[PRReview]) -> list[PRReview]:
 
     GitHub returns a separate review object per pass (e.g. first CHANGES_REQUESTED,
     then APPROVED). We merge them: concatenate bodies, keep the last state.
+    The reviews are freshly parsed, so later passes are folded into the
+    reviewer's first review in place.
     """
     by_author: dict[str, PRReview] = {}
     for r in reviews:
-        if r.author not in by_author:
-            by_author[r.author] = r
-        else:
-            prev = by_author[r.author]
-            combined_body = "\n\n".join(
-                part for part in [prev.body, r.body] if part.strip()
-            )
-            by_author[r.author] = PRReview(
-                author=r.author,
-                state=r.state,  # last state wins (chronological order from API)
-                body=combined_body,
-                is_bot=r.is_bot,
-                review_comments=prev.review_comments + r.review_comments,
-            )
+        prev = by_author.setdefault(r.author, r)
+        if prev is r:
+            continue
+        prev.body = "\n\n".join(part for part in [prev.body, r.body] if part.strip())
+        prev.state = r.state  # last state wins (chronological order from API)
+        prev.is_bot = r.is_bot
+        prev.review_comments.extend(r.review_comments)
     return list(by_author.values())
 
 
 def _parse_node(node: dict) -> PRData:
-    """Convert a single GraphQL PR node into a PRData object."""
+    """Convert a single GraphQL PR node into a PRData object.
+
+    Models are built with ``model_construct``: every field comes from
+    GitHub's typed (non-null) schema, so per-field validation only costs time.
+    """
     author_node = node.get("author")
     author_login = author_node["login"] if author_node else "ghost"
 
-    reviews = _merge_reviews([
-        PRReview(
-            author=r["author"]["login"] if r.get("author") else "ghost",
+    # Each review's author node is read once: for the login, the bot check,
+    # and to skip the PR author's own reviews
+    raw_reviews: list[PRReview] = []
+    for r in (node.get("reviews") or {}).get("nodes") or []:
+        reviewer = r.get("author")
+        login = reviewer["login"] if reviewer else None
+        if login == author_login:
+            continue
+        raw_reviews.append(PRReview.model_construct(
+            author=login if reviewer else "ghost",
             state=r["state"],
             body=r.get("body", ""),
-            is_bot=_is_bot_typename(r.get("author")),
+            is_bot=_is_bot_typename(reviewer),
             review_comments=[
-                c["body"]
-                for c in (r.get("comments", {}).get("nodes", []) or [])
-                if c.get("body", "").strip()
+                body
+                for c in (r.get("comments") or {}).get("nodes") or []
+                if (body := c.get("body", "")).strip()
             ],
-        )
-        for r in (node.get("reviews", {}).get("nodes", []) or [])
-        if (r.get("author", {}) or {}).get("login") != author_login
-    ])
-    commit_nodes = (node.get("commits") or {}).get("nodes") or []
+        ))
+    reviews = _merge_reviews(raw_reviews)
+
+    commit_nodes = (node.get("commits") or {}).get("nodes")
     author_email = ""
     if commit_nodes:
-        author_email = (commit_nodes[0].get("commit", {}).get("author", {}).get("email") or "")
+        author_email = ((commit_nodes[0].get("commit") or {}).get("author") or {}).get("email") or ""
 
-    return PRData(
+    return PRData.model_construct(
         number=node["number"],
         title=node["title"],
         author=author_login,
@@ -97,148 +195,274 @@ def _parse_node(node: dict) -> PRData:
         body=node.get("body", ""),
         reviews=reviews,
         comments=node.get("comments", {}).get("totalCount", 0),
-        files=[f["path"] for f in (node.get("files", {}).get("nodes", []) or [])],
+        files=[f["path"] for f in (node.get("files") or {}).get("nodes") or []],
     )
 
 
-async def fetch_prs(repo_url: str, months: int = 6) -> list[PRData]:
-    """Fetch all merged PRs within the given timeframe using paginated GraphQL.
+async def fetch_prs(
+    repo_url: str,
+    months: int = 6,
+    include_files: bool = True,
+    include_reviews: bool = True,
+) -> AsyncIterator[PRData]:
+    """Yield all merged PRs within the given timeframe using GraphQL.
+
+    Runs in two phases: a lightweight paginated query lists the merged PRs
+    and their merge dates, then full details are requested only for the PRs
+    inside the window, DETAIL_BATCH_SIZE at a time. Callers that don't need
+    file lists or reviews can leave them out, which shrinks each batch further.
 
-    Paginates through results until all PRs in the timeframe are collected,
-    or we run out of pages.
+    Detail batches download concurrently and are yielded in listing order
+    (most recently updated first) as soon as each is parsed, so a consumer
+    that stops early keeps everything received so far.
     """
     slug = repo_slug(repo_url)
     owner, name = slug.split("/")
     cutoff = datetime.now(timezone.utc) - timedelta(days=months * 30)
 
-    query = """
-    query($owner: String!, $name: String!, $limit: Int!, $cursor: String) {
-      repository(owner: $owner, name: $name) {
-        pullRequests(first: $limit, states: MERGED, orderBy: {field: UPDATED_AT, direction: DESC}, after: $cursor) {
-          pageInfo { hasNextPage endCursor }
-          nodes {
-            number
-            title
-            author { login __typename }
-            commits(last: 1) {
-              nodes { commit { author { email } } }
-            }
-            createdAt
-            mergedAt
-            additions
-            deletions
-            changedFiles
-            body
-            comments { totalCount }
-            files(first: 50) { nodes { path } }
-            reviews(first: 20) {
-              nodes {
-                author { login __typename }
-                state
-                body
-                comments(first: 30) {
-                  nodes { body }
-                }
-              }
-            }
-          }
-        }
-      }
+    client = await get_github_client()
+    if client is None:
+        for pr in await _fetch_prs_rest_fallback(slug, months):
+            yield pr
+        return
+
+    try:
+        numbers = await _list_pr_numbers(client, owner, name, cutoff)
+    except _Unauthorized:
+        for pr in await _fetch_prs_rest_fallback(slug, months):
+            yield pr
+        return
+
+    batches = [numbers[i:i + DETAIL_BATCH_SIZE] for i in range(0, len(numbers), DETAIL_BATCH_SIZE)]
+    variables = {
+        "owner": owner,
+        "name": name,
+        "withFiles": include_files,
+        "withReviews": include_reviews,
     }
+    tasks = [
+        asyncio.create_task(_post_graphql(
+            client,
+            _detail_query(len(batch)),
+            {**variables, **{f"n{i}": number for i, number in enumerate(batch)}},
+            allow_partial=True,
+        ))
+        for batch in batches
+    ]
+
+    fetched = 0
+    errors: list[str] = []
+    try:
+        for batch, task in zip(batches, tasks):
+            data, err, status = await task
+            repo = (data.get("data") or {}).get("repository")
+            if repo is None:
+                if status == 401 and not fetched:
+                    for pr in await _fetch_prs_rest_fallback(slug, months):
+                        yield pr
+                    return
+                logger.warning(f"GraphQL detail request failed for {len(batch)} PRs: {err}")
+                errors.append(err)
+                continue
+            if err:
+                # Aliases that failed to resolve come back null; keep the rest
+                logger.warning(f"GraphQL detail request returned partial data: {err}")
+            for i in range(len(batch)):
+                if (node := repo.get(f"pr{i}")) is not None:
+                    fetched += 1
+                    yield _parse_node(node)
+    finally:
+        # The consumer may stop early; don't leave requests running
+        for task in tasks:
+            task.cancel()
+
+    # If every batch fails, raise. Otherwise keep what we have.
+    if batches and len(errors) == len(batches):
+        raise RuntimeError(f"GitHub GraphQL request failed: {errors[0]}")
+
+    logger.info(f"Fetched {fetched} merged PRs within {months}-month window for {slug}")
+
+
+class _Unauthorized(Exception):
+    """GitHub rejected the token; callers switch to the REST fallback."""
+
+
+async def _list_pr_numbers(client: httpx.AsyncClient, owner: str, name: str, cutoff: datetime) -> list[int]:
+    """Numbers of the merged PRs inside the window, most recently updated first.
+
+    Pages carry only each PR's number and merge date, so PRs outside the
+    window cost a few bytes rather than their full body, files and reviews.
     """
+    # GraphQL DateTimes are always "YYYY-MM-DDTHH:MM:SSZ" in UTC, which sort
+    # chronologically as strings, so merge dates are compared without parsing
+    cutoff_str = cutoff.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    all_prs: list[PRData] = []
-    cursor: str | None = None
+    numbers: list[int] = []
     max_pages = 10  # Safety cap: 10 pages × 100 = 1000 PRs max
+    variables = {"owner": owner, "name": name, "limit": PAGE_SIZE}
 
-    max_retries = 5
+    # Pages chain through cursors, but the next page is requested as soon as
+    # its cursor is known, so it downloads while this page is being parsed
+    next_page = asyncio.create_task(_post_graphql(client, _PR_LIST_QUERY, {**variables, "cursor": None}))
+    try:
+        for page in range(max_pages):
+            data, err, status = await next_page
+
+            if err:
+                if status == 401:
+                    raise _Unauthorized(err)
+                # If first page fails, raise. If later page, return what we have.
+                if not numbers:
+                    raise RuntimeError(f"GitHub GraphQL request failed: {err}")
+                logger.warning(f"GraphQL pagination failed on page, returning {len(numbers)} PRs: {err}")
+                break
 
-    for _ in range(max_pages):
-        args = [
-            "gh", "api", "graphql",
-            "-f", f"query={query}",
-            "-F", f"owner={owner}",
-            "-F", f"name={name}",
-            "-F", f"limit={PAGE_SIZE}",
-        ]
-        if cursor:
-            args += ["-f", f"cursor={cursor}"]
-
-        stdout = b""
-        stderr = b""
-        returncode = 1
-        for attempt in range(max_retries):
-            proc = await asyncio.create_subprocess_exec(
-                *args,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            stdout, stderr = await proc.communicate()
-            returncode = proc.returncode
+            connection = data["data"]["repository"]["pullRequests"]
+            page_info = connection["pageInfo"]
+            nodes = connection["nodes"]
 
-            if returncode == 0:
+            if not nodes:
                 break
 
-            err = stderr.decode()
-            is_transient = "502" in err or "503" in err or "504" in err or "timeout" in err.lower() or "try resubmitting" in err.lower()
-            if not is_transient:
+            # Check if the oldest PR on this page is beyond our cutoff.
+            # Since results are ordered by UPDATED_AT DESC, once we see PRs
+            # whose mergedAt is before the cutoff, we're likely past the window.
+            merged_dates = [node.get("mergedAt") or "" for node in nodes]
+            past_cutoff = any(merged and merged < cutoff_str for merged in merged_dates)
+            more = not past_cutoff and page_info["hasNextPage"] and page + 1 < max_pages
+            if more:
+                next_page = asyncio.create_task(
+                    _post_graphql(client, _PR_LIST_QUERY, {**variables, "cursor": page_info["endCursor"]})
+                )
+
+            # No merged_at — include it (edge case)
+            numbers.extend(
+                node["number"]
+                for node, merged in zip(nodes, merged_dates)
+                if not merged or merged >= cutoff_str
+            )
+
+            if not more:
                 break
+    finally:
+        next_page.cancel()
 
-            delay = 3 ** attempt
-            logger.warning(f"GraphQL request failed (attempt {attempt + 1}/{max_retries}): {err.strip()} — retrying in {delay}s")
-            await asyncio.sleep(delay)
-
-        if returncode != 0:
-            err = stderr.decode()
-            if "auth" in err.lower() or "login" in err.lower():
-                return await _fetch_prs_rest_fallback(slug, months)
-            # If first page fails, raise. If later page, return what we have.
-            if not all_prs:
-                raise RuntimeError(f"gh api graphql failed: {err}")
-            logger.warning(f"GraphQL pagination failed on page, returning {len(all_prs)} PRs: {err}")
-            break
+    return numbers
 
-        data = json.loads(stdout.decode())
-        connection = data["data"]["repository"]["pullRequests"]
-        page_info = connection["pageInfo"]
-        nodes = connection["nodes"]
 
-        if not nodes:
-            break
+@lru_cache(maxsize=DETAIL_BATCH_SIZE)
+def _detail_query(size: int) -> str:
+    """A query fetching full details for PRs $n0..$n<size-1>, aliased pr0, pr1, ...
 
-        # Check if the oldest PR on this page is beyond our cutoff.
-        # Since results are ordered by UPDATED_AT DESC, once we see PRs
-        # whose mergedAt is before the cutoff, we're likely past the window.
-        past_cutoff = False
-        for node in nodes:
-            pr = _parse_node(node)
-            merged = _parse_dt(pr.merged_at or "")
-            if merged and merged >= cutoff:
-                all_prs.append(pr)
-            elif merged and merged < cutoff:
-                past_cutoff = True
-            else:
-                # No merged_at — include it (edge case)
-                all_prs.append(pr)
+    PR numbers are passed as variables, so the text only depends on the batch size.
+    """
+    params = "".join(f", $n{i}: Int!" for i in range(size))
+    aliases = " ".join(f"pr{i}: pullRequest(number: $n{i}) {{ ...PRFields }}" for i in range(size))
+    return (
+        f"query($owner: String!, $name: String!, $withFiles: Boolean!, $withReviews: Boolean!{params}) "
+        f"{{ repository(owner: $owner, name: $name) {{ {aliases} }} }}\n"
+        + _PR_FIELDS_FRAGMENT
+    )
 
-        if past_cutoff or not page_info["hasNextPage"]:
-            break
 
-        cursor = page_info["endCursor"]
+async def _post_graphql(
+    client: httpx.AsyncClient,
+    query: str,
+    variables: dict,
+    allow_partial: bool = False,
+) -> tuple[dict, str, int]:
+    """POST a GraphQL query, retrying transient failures.
+
+    Returns (data, error message or "", last HTTP status). GraphQL errors
+    alongside a 200 fail the request, unless ``allow_partial`` is set and the
+    response still carries a repository: then the partial data is returned
+    together with the error text.
+    """
+    max_retries = 5
+    data: dict = {}
+    err = ""
+    status = 0
+    for attempt in range(max_retries):
+        delay = 3 ** attempt
+        try:
+            async with _request_slots:
+                resp = await client.post(GRAPHQL_URL, json={"query": query, "variables": variables})
+        except httpx.TransportError as e:
+            err = f"{type(e).__name__}: {e}"
+            is_transient = True
+        else:
+            status = resp.status_code
+            bad_body = False
+            if status == 200:
+                try:
+                    data = from_json(resp.content)
+                except ValueError:
+                    # e.g. an HTML error page from a proxy
+                    data, bad_body = {}, True
+                    err = f"HTTP 200 with a non-JSON body: {resp.text.strip()[:200]}"
+                else:
+                    if not data.get("errors"):
+                        return data, "", status
+                    # GraphQL-level errors arrive with a 200
+                    err = "; ".join(e.get("message", "") for e in data["errors"])
+                    if allow_partial and (data.get("data") or {}).get("repository") is not None:
+                        return data, err, status
+            else:
+                err = f"HTTP {status}: {resp.text.strip()}"
+            lowered = err.lower()
+            is_transient = (
+                bad_body
+                or status in (502, 503, 504)
+                or "timeout" in lowered
+                or "try resubmitting" in lowered
+            )
+            # When rate limited, wait exactly as long as GitHub asks, within reason
+            wait = _rate_limit_wait(resp, lowered)
+            if wait is not None:
+                if wait > GITHUB_RATE_LIMIT_MAX_WAIT:
+                    break
+                is_transient, delay = True, wait
+        if not is_transient:
+            break
 
-    logger.info(f"Fetched {len(all_prs)} merged PRs within {months}-month window for {slug}")
-    return all_prs
+        logger.warning(f"GraphQL request failed (attempt {attempt + 1}/{max_retries}): {err} — retrying in {delay}s")
+        await asyncio.sleep(delay)
+    return data, err, status
+
+
+def _rate_limit_wait(resp: httpx.Response, lowered_err: str) -> float | None:
+    """Seconds GitHub asks us to wait before retrying, or None if not rate limited."""
+    headers = resp.headers
+    if retry_after := headers.get("retry-after"):
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    if headers.get("x-ratelimit-remaining") == "0" and (reset := headers.get("x-ratelimit-reset")):
+        try:
+            return max(0.0, int(reset) - time.time())
+        except ValueError:
+            pass
+    if resp.status_code in (403, 429) and "rate limit" in lowered_err:
+        # Secondary limits without a header: GitHub recommends waiting a minute
+        return 60.0
+    return None
 
 
 async def _fetch_prs_rest_fallback(slug: str, months: int) -> list[PRData]:
-    """Fallback using gh pr list (REST-based, simpler)."""
+    """Fallback using gh pr list (REST-based, simpler).
+
+    GitHub's search narrows the list to the window (by day), and gh pages
+    through it, so long windows aren't cut off at a fixed count.
+    """
     cutoff = datetime.now(timezone.utc) - timedelta(days=months * 30)
 
     proc = await asyncio.create_subprocess_exec(
         "gh", "pr", "list",
         "--repo", slug,
         "--state", "merged",
-        "--limit", "200",
+        "--search", f"merged:>={cutoff.date().isoformat()}",
+        "--limit", str(REST_FALLBACK_LIMIT),
         "--json", "number,title,author,createdAt,mergedAt,additions,deletions,changedFiles,body,comments,files,reviews",
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
@@ -246,9 +470,10 @@ async def _fetch_prs_rest_fallback(slug: str, months: int) -> list[PRData]:
     stdout, stderr = await proc.communicate()
 
     if proc.returncode != 0:
+        logger.warning(f"gh pr list failed: {stderr.decode(errors='replace').strip()}")
         return []
 
-    items = json.loads(stdout.decode())
+    items = from_json(stdout)
     prs: list[PRData] = []
     for item in items:
         merged = _parse_dt(item.get("mergedAt", ""))
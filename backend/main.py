@@ -1,37 +1,61 @@
 import asyncio
+import heapq
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 
-from backend.api.routes import _active_tasks, cleanup_old_jobs, router
+from backend.api.routes import _active_tasks, cleanup_old_jobs, result_store, router
 from backend.config import CORS_ORIGINS
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
 
-async def _cleanup_loop():
-    """Run job cleanup every 5 minutes."""
-    while True:
-        await asyncio.sleep(300)
+# Periodic housekeeping as (interval in seconds, coroutine function); all of it
+# runs from one task that sleeps until the nearest deadline
+_HOUSEKEEPING = [
+    (300, cleanup_old_jobs),
+]
+
+
+async def _housekeeping_loop():
+    """Run each housekeeping job at its own cadence."""
+    loop = asyncio.get_running_loop()
+    # Entries are (deadline, index, interval, job); the index breaks deadline ties
+    heap = [(loop.time() + interval, i, interval, job) for i, (interval, job) in enumerate(_HOUSEKEEPING)]
+    heapq.heapify(heap)
+    while heap:
+        deadline, i, interval, job = heap[0]
+        await asyncio.sleep(max(0.0, deadline - loop.time()))
         try:
-            await cleanup_old_jobs()
+            await job()
         except Exception as e:
-            logger.warning(f"Cleanup loop error: {e}")
+            logger.warning(f"Housekeeping error in {job.__name__}: {e}")
+        # Keep the cadence fixed, but never queue up missed runs
+        heapq.heapreplace(heap, (max(deadline + interval, loop.time()), i, interval, job))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Jobs, rate limits, the analysis semaphore and WebSocket clients live in
+    # this process; extra workers would each get their own copy
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        logger.error("WEB_CONCURRENCY > 1 is unsupported: xray keeps job state in-process, run a single worker")
     Path("cached_results").mkdir(exist_ok=True)
-    cleanup_task = asyncio.create_task(_cleanup_loop())
+    # Results cached as per-repo JSON files by older versions move into the store
+    imported = await asyncio.to_thread(result_store.import_files, "cached_results")
+    if imported:
+        logger.info(f"Imported {imported} cached results into the result store")
+    housekeeping_task = asyncio.create_task(_housekeeping_loop())
     logger.info("xray backend starting")
     yield
-    # Shutdown: cancel cleanup loop
-    cleanup_task.cancel()
+    # Shutdown: cancel housekeeping
+    housekeeping_task.cancel()
     # Cancel all active analysis tasks
     if _active_tasks:
         logger.info(f"Cancelling {len(_active_tasks)} active analysis tasks...")
@@ -1,6 +1,6 @@
 import { useReducer, useCallback, useRef, useEffect } from 'react';
 import { startAnalysis, createWebSocket, getCached, getJobStatus } from '../api/client';
-import type { AppState, AppAction, WSMessage, GraphData, GraphLink } from '../types';
+import type { AnalysisResult, AppState, AppAction, WSMessage, GraphData, GraphLink } from '../types';
 
 type Tab = AppState['activeTab'];
 const VALID_TABS: Tab[] = ['graph', 'dashboard', 'insights'];
@@ -133,8 +133,10 @@ function reducer(state: AppState, action: AppAction): AppState {
       };
     case 'PARTIAL_RESULT': {
       if (state.status !== 'analyzing') return state;
-      const graph = mergeGraphData(state.analyzingResult?.graph, action.data.graph);
-      const updatedData = { ...action.data, graph };
+      // Partial results are deltas — overlay them on what we already have
+      const prevGraph = state.analyzingResult?.graph;
+      const graph = action.data.graph ? mergeGraphData(prevGraph, action.data.graph) : prevGraph;
+      const updatedData = { ...state.analyzingResult, ...action.data, graph } as AnalysisResult;
       const isViewingAnalysis = !state.result || state.result.repo_name === state.analyzingRepoName;
       return {
         ...state,
@@ -117,6 +117,7 @@ export interface WSMessage {
   total_stages: number;
   message: string;
   progress: number;
+  // partial_result after stage 2 carries only the fields that stage changed
   data?: AnalysisResult;
 }
 
@@ -140,7 +141,7 @@ export interface AppState {
 export type AppAction =
   | { type: 'START_ANALYSIS'; jobId: string; repoName: string }
   | { type: 'PROGRESS'; stage: number; progress: number; message: string }
-  | { type: 'PARTIAL_RESULT'; data: AnalysisResult }
+  | { type: 'PARTIAL_RESULT'; data: Partial<AnalysisResult> }
   | { type: 'COMPLETE'; data: AnalysisResult }
   | { type: 'ERROR'; message: string }
   | { type: 'SELECT_NODE'; node: GraphNode | null }
@@ -0,0 +1,38 @@
+"""Throwaway git repositories for tests that run real git commands."""
+
+import os
+import subprocess
+from pathlib import Path
+
+
+class GitRepo:
+    def __init__(self, path: Path):
+        self.path = path
+        self.git("init", "-q", "-b", "main")
+
+    def git(self, *args: str, author: str = "Alice") -> str:
+        env = {
+            **os.environ,
+            "GIT_AUTHOR_NAME": author,
+            "GIT_AUTHOR_EMAIL": f"{author.lower()}@example.com",
+            "GIT_COMMITTER_NAME": author,
+            "GIT_COMMITTER_EMAIL": f"{author.lower()}@example.com",
+            "GIT_CONFIG_GLOBAL": os.devnull,
+            "GIT_CONFIG_NOSYSTEM": "1",
+        }
+        return subprocess.run(
+            ["git", "-C", str(self.path), *args],
+            check=True, capture_output=True, text=True, env=env,
+        ).stdout
+
+    def write(self, name: str, content: str) -> None:
+        path = self.path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def commit(self, message: str, author: str = "Alice", **files: str) -> str:
+        for name, content in files.items():
+            self.write(name, content)
+        self.git("add", "-A", author=author)
+        self.git("commit", "-q", "--allow-empty", "-m", message, author=author)
+        return self.git("rev-parse", "HEAD").strip()
@@ -0,0 +1,62 @@
+import asyncio
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from backend.ingestion.blame import get_blame
+from tests.gitrepo import GitRepo
+
+
+def porcelain_counts(repo: GitRepo, file_path: str) -> Counter:
+    """Lines per author email according to git blame --line-porcelain."""
+    out = repo.git("blame", "--line-porcelain", "--", file_path)
+    return Counter(line[12:].strip("<>") for line in out.splitlines() if line.startswith("author-mail "))
+
+
+class GetBlameTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = GitRepo(Path(self._tmp.name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def blame(self, file_path: str):
+        return asyncio.run(get_blame(self.repo.path, file_path))
+
+    def test_counts_lines_per_author(self):
+        self.repo.commit("one", author="Alice", **{"a.py": "1\n2\n3\n4\n"})
+        self.repo.commit("two", author="Bob", **{"a.py": "1\nB\n3\n4\n5\n6\n"})
+        self.repo.commit("three", author="Carol", **{"a.py": "C\nB\n3\n4\n5\n6\n"})
+        self.repo.commit("four", author="Bob", **{"a.py": "C\nB\n3\nB2\n5\n6\n"})
+
+        result = self.blame("a.py")
+
+        self.assertEqual(result.total_lines, 6)
+        self.assertEqual(
+            {e.author_email: e.lines for e in result.entries},
+            dict(porcelain_counts(self.repo, "a.py")),
+        )
+        # Carol and Alice tie on one line each; Carol's comes first in the file
+        self.assertEqual([e.author_name for e in result.entries], ["Bob", "Carol", "Alice"])
+
+    def test_ties_keep_first_line_order(self):
+        self.repo.commit("one", author="Bob", **{"a.py": "b\n"})
+        self.repo.commit("two", author="Alice", **{"a.py": "a\nb\n"})
+        result = self.blame("a.py")
+        self.assertEqual([e.author_name for e in result.entries], ["Alice", "Bob"])
+
+    def test_commit_reused_by_separate_groups(self):
+        self.repo.commit("one", author="Alice", **{"a.py": "1\n2\n3\n"})
+        self.repo.commit("two", author="Bob", **{"a.py": "1\nB\n3\n"})
+        result = self.blame("a.py")
+        self.assertEqual({e.author_name: e.lines for e in result.entries}, {"Alice": 2, "Bob": 1})
+
+    def test_missing_file(self):
+        self.repo.commit("one", **{"a.py": "x\n"})
+        self.assertIsNone(self.blame("missing.py"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import asyncio
+import unittest
+
+from backend.api.broadcast import ClientQueue
+
+
+class ClientQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def drain(self, queue: ClientQueue) -> list[str]:
+        out = []
+        while queue._pending:
+            out.append((await queue.get())[1])
+        return out
+
+    async def test_pending_progress_is_superseded(self):
+        queue = ClientQueue()
+        for i in range(5):
+            queue.put(f"progress {i}", supersedable=True)
+        self.assertEqual(await self.drain(queue), ["progress 4"])
+
+    async def test_data_messages_are_never_dropped(self):
+        queue = ClientQueue()
+        queue.put("progress 1", supersedable=True)
+        queue.put("partial")
+        queue.put("progress 2", supersedable=True)
+        queue.put("progress 3", supersedable=True)
+        queue.put("complete")
+        self.assertEqual(await self.drain(queue), ["progress 1", "partial", "progress 3", "complete"])
+
+    async def test_get_waits_for_put(self):
+        queue = ClientQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        self.assertFalse(getter.done())
+        queue.put("hello")
+        self.assertEqual(await asyncio.wait_for(getter, timeout=1), (False, "hello"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from backend.cache import AsyncCache, DiskStore, content_key
+
+
+class ContentKeyTest(unittest.TestCase):
+    def test_stable_and_order_sensitive(self):
+        self.assertEqual(content_key("a", "b"), content_key("a", "b"))
+        self.assertNotEqual(content_key("a", "b"), content_key("b", "a"))
+
+    def test_parts_are_delimited(self):
+        self.assertNotEqual(content_key("ab", "c"), content_key("a", "bc"))
+
+
+class DiskStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name) / "store"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        store = DiskStore(self.dir, ttl=60)
+        store.save("k", {"a": [1, 2]})
+        self.assertEqual(store.load("k"), {"a": [1, 2]})
+        self.assertIsNone(store.load("missing"))
+
+    def test_expired_entries_are_misses(self):
+        store = DiskStore(self.dir, ttl=60)
+        store.save("k", 1)
+        old = time.time() - 120
+        os.utime(self.dir / "k.json", (old, old))
+        self.assertIsNone(store.load("k"))
+        self.assertFalse((self.dir / "k.json").exists())
+
+    def test_corrupt_entries_are_misses(self):
+        store = DiskStore(self.dir, ttl=60)
+        self.dir.mkdir(parents=True)
+        (self.dir / "k.json").write_text("{not json")
+        self.assertIsNone(store.load("k"))
+
+
+class AsyncCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_misses_share_one_call(self):
+        cache = AsyncCache()
+        calls = 0
+        release = asyncio.Event()
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "value"
+
+        waiters = [asyncio.create_task(cache.get_or_set("k", factory)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await asyncio.gather(*waiters), ["value"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(await cache.get("k"), "value")
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        cache = AsyncCache()
+        release = asyncio.Event()
+
+        async def factory():
+            await release.wait()
+            return "value"
+
+        first = asyncio.create_task(cache.get_or_set("k", factory))
+        second = asyncio.create_task(cache.get_or_set("k", factory))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        self.assertEqual(await second, "value")
+
+    async def test_failures_are_not_cached(self):
+        cache = AsyncCache()
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise ValueError("boom")
+            return "ok"
+
+        with self.assertRaises(ValueError):
+            await cache.get_or_set("k", flaky)
+        self.assertEqual(await cache.get_or_set("k", flaky), "ok")
+        self.assertEqual(attempts, 2)
+
+    async def test_lru_eviction(self):
+        cache = AsyncCache(max_size=2)
+        for key in "abc":
+            await cache.set(key, key)
+        self.assertIsNone(await cache.get("a"))
+        self.assertEqual(await cache.get("c"), "c")
+
+    async def test_disk_store_survives_new_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DiskStore(tmp, ttl=60)
+            await AsyncCache(store=store).get_or_set("k", _const("stored"))
+
+            async def never():
+                raise AssertionError("factory called despite a disk hit")
+
+            self.assertEqual(await AsyncCache(store=store).get_or_set("k", never), "stored")
+
+
+def _const(value):
+    async def factory():
+        return value
+    return factory
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import time
+import unittest
+
+from backend.agents.client import CircuitBreaker, CircuitOpenError
+
+
+def call(breaker: CircuitBreaker, exc: BaseException | None = None) -> str:
+    try:
+        with breaker.guard():
+            if exc is not None:
+                raise exc
+        return "ok"
+    except CircuitOpenError:
+        return "open"
+    except TimeoutError:
+        return "failed"
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+
+    def trip(self):
+        self.assertEqual([call(self.breaker, TimeoutError()) for _ in range(2)], ["failed", "failed"])
+
+    def test_opens_after_threshold(self):
+        self.trip()
+        self.assertEqual(call(self.breaker), "open")
+
+    def test_success_resets_failure_count(self):
+        call(self.breaker, TimeoutError())
+        call(self.breaker)
+        call(self.breaker, TimeoutError())
+        self.assertEqual(call(self.breaker), "ok")
+
+    def test_non_transient_errors_do_not_count(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError), self.breaker.guard():
+                raise ValueError("bad output")
+        self.assertEqual(call(self.breaker), "ok")
+
+    def test_half_open_allows_a_single_trial(self):
+        self.trip()
+        time.sleep(0.06)
+        trial = self.breaker.guard()
+        trial.__enter__()
+        self.assertEqual(call(self.breaker), "open")
+        trial.__exit__(None, None, None)
+        self.assertEqual([call(self.breaker), call(self.breaker)], ["ok", "ok"])
+
+    def test_failed_trial_reopens(self):
+        self.trip()
+        time.sleep(0.06)
+        self.assertEqual(call(self.breaker, TimeoutError()), "failed")
+        self.assertEqual(call(self.breaker), "open")
+
+    def test_abandoned_trial_frees_the_slot(self):
+        self.trip()
+        time.sleep(0.06)
+        with self.assertRaises(KeyboardInterrupt), self.breaker.guard():
+            raise KeyboardInterrupt
+        self.assertEqual(call(self.breaker), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from backend.ingestion import clone
+from tests.gitrepo import GitRepo
+
+
+class CloneRepoTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        (tmp / "owner" / "repo").mkdir(parents=True)
+        self.repo = GitRepo(tmp / "owner" / "repo")
+        self.url = f"file://{self.repo.path}"
+        for p in (
+            mock.patch.object(clone, "CLONE_BASE_DIR", str(tmp / "clones")),
+            mock.patch.dict(os.environ, {"GIT_CONFIG_GLOBAL": os.devnull, "GIT_CONFIG_NOSYSTEM": "1"}),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+        clone.repo_local_path.cache_clear()
+        self.addCleanup(clone.repo_local_path.cache_clear)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def commit_at(self, date: str, message: str) -> str:
+        with mock.patch.dict(os.environ, {"GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}):
+            return self.repo.commit(message, **{"a.py": message})
+
+    async def clone(self) -> Path:
+        dest = await clone.clone_repo(self.url, history_months=6)
+        await clone.wait_for_history(dest)
+        return dest
+
+    async def test_recent_history_is_cloned_shallow(self):
+        self.commit_at("2000-01-01T00:00:00", "old")
+        head = self.repo.commit("new")
+        dest = await self.clone()
+        self.assertEqual(self.repo.git("-C", str(dest), "rev-parse", "HEAD").strip(), head)
+        self.assertEqual(len(self.repo.git("-C", str(dest), "rev-list", "HEAD").split()), 2)
+
+    async def test_window_without_commits_falls_back_to_full_clone(self):
+        head = self.commit_at("2000-01-01T00:00:00", "old")
+        dest = await self.clone()
+        self.assertEqual(self.repo.git("-C", str(dest), "rev-parse", "HEAD").strip(), head)
+        self.assertEqual(clone.shallow_commits(dest), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
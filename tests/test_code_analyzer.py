@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+from backend.agents import code_analyzer
+from backend.agents.code_analyzer import _fast_classify, _to_classification
+from backend.api.schemas import PRData
+from backend.cache import AsyncCache
+
+
+def pr(number: int = 1, files: list[str] | None = None) -> PRData:
+    files = files or []
+    return PRData(number=number, title="t", author="alice", created_at="", files=files, changed_files=len(files))
+
+
+def diff(*lines: str) -> str:
+    return "\n".join(["--- a/f", "+++ b/f", "@@ -1 +1 @@", *lines])
+
+
+GOOD = {
+    "change_type": "bugfix",
+    "complexity": "moderate",
+    "knowledge_depth": "deep",
+    "expertise_signals": ["Handles the empty case"],
+    "modules_touched": ["backend/api"],
+    "summary": "s",
+}
+
+
+class ValidationTest(unittest.TestCase):
+    def test_defaults_fill_missing_and_null_fields(self):
+        c = _to_classification(pr(), {"change_type": "docs", "knowledge_depth": None})
+        self.assertEqual((c.pr_number, c.author, c.change_type, c.knowledge_depth), (1, "alice", "docs", "working"))
+
+    def test_wrong_types_are_rejected(self):
+        for data in ([GOOD], {"modules_touched": [["backend", "api"]]}, {"summary": 3}):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                _to_classification(pr(), data)
+
+
+class FastClassifyTest(unittest.TestCase):
+    def test_docs_only(self):
+        c = _fast_classify(pr(files=["README.md", "docs/guide.rst"]), diff("-old", "+new"))
+        self.assertEqual((c.change_type, c.knowledge_depth), ("docs", "surface"))
+        self.assertIsNone(_fast_classify(pr(files=["requirements.txt"]), diff("+leftpad")))
+
+    def test_version_bump_in_manifests(self):
+        bump = diff('-    "react": "^18.2.0",', '+    "react": "^18.3.1",')
+        c = _fast_classify(pr(files=["package.json", "package-lock.json"]), bump)
+        self.assertEqual(c.change_type, "dependency")
+        c = _fast_classify(pr(files=["requirements-dev.txt"]), diff("-httpx==0.27.0", "+httpx==0.28.1"))
+        self.assertEqual(c.change_type, "dependency")
+
+    def test_version_lines_outside_manifests_need_the_model(self):
+        self.assertIsNone(_fast_classify(pr(files=["src/limits.py"]), diff("-TIMEOUT = 1.5", "+TIMEOUT = 2.5")))
+        self.assertIsNone(_fast_classify(pr(files=["deploy/app.yaml"]), diff("-replicas: 2.0", "+replicas: 3.0")))
+
+    def test_config_changes_need_the_model(self):
+        self.assertIsNone(_fast_classify(pr(files=[".github/workflows/ci.yml"]), diff("-  run: a", "+  run: b")))
+        self.assertIsNone(_fast_classify(pr(files=["schema.json"]), diff('-"type": "a"', '+"type": "b"')))
+
+    def test_truncated_file_list_needs_the_model(self):
+        p = pr(files=["README.md"])
+        p.changed_files = 60
+        self.assertIsNone(_fast_classify(p, diff("-old", "+new")))
+
+
+class AnalyzeExpertiseTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = AsyncCache()
+        self.replies: list = []
+        for p in (
+            mock.patch.object(code_analyzer, "_cache", self.cache),
+            mock.patch.object(code_analyzer, "_classify", self.fake_classify),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def fake_classify(self, user_message, max_tokens=1024):
+        return self.replies.pop(0)
+
+    async def cached(self, diff: str):
+        return await self.cache.get(code_analyzer._cache_key(diff))
+
+    async def test_invalid_reply_falls_back_uncached(self):
+        self.replies = [{**GOOD, "modules_touched": [["backend", "api"]]}]
+        c = await code_analyzer.analyze_pr_expertise(pr(), "diff")
+        self.assertEqual(c.summary, "Analysis failed: ValidationError")
+        self.assertIsNone(await self.cached("diff"))
+
+    async def test_invalid_batch_item_is_retried_alone(self):
+        diffs = {1: "diff one", 2: "diff two"}
+        self.replies = [
+            [{**GOOD, "pr_number": 1}, {**GOOD, "pr_number": 2, "expertise_signals": "not a list"}],
+            GOOD,
+        ]
+        results = await code_analyzer.analyze_pr_expertise_batch([pr(1), pr(2)], diffs)
+        self.assertEqual(sorted(c.pr_number for c in results), [1, 2])
+        self.assertEqual(self.replies, [])
+        self.assertEqual(await self.cached("diff one"), GOOD)
+        self.assertEqual(await self.cached("diff two"), GOOD)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import itertools
+import unittest
+from fnmatch import fnmatchcase
+
+from backend.config import EXCLUDED_FILE_PATTERNS, is_excluded_file
+
+
+def reference(path: str) -> bool:
+    """The original matcher: every pattern against the path, then its basename."""
+    basename = path.rsplit("/", 1)[-1]
+    return any(fnmatchcase(path, p) or fnmatchcase(basename, p) for p in EXCLUDED_FILE_PATTERNS)
+
+
+class IsExcludedFileTest(unittest.TestCase):
+    def test_known_paths(self):
+        cases = {
+            "package-lock.json": True,
+            "web/package-lock.json": True,
+            "README.md": True,
+            "docs/guide/intro.py": True,
+            "src/docs/intro.py": False,
+            ".github/workflows/ci.yml": True,
+            "static/app.min.js": True,
+            "static/app.js": False,
+            "LICENSE": True,
+            "src/CHANGELOG.rst": True,
+            "Makefile.lock.py": False,
+            "src/main.py": False,
+            "assets/logo.PNG": False,
+            # Bare names equal to an excluded extension have no extension at all
+            "md": False,
+            "lock": False,
+            ".md": True,
+        }
+        for path, expected in cases.items():
+            with self.subTest(path=path):
+                self.assertEqual(is_excluded_file(path), expected)
+
+    def test_matches_fnmatch_reference(self):
+        dirs = ["", "src/", "docs/", "a/docs/", ".github/", "vendor/", "x/vendor/", "node_modules/pkg/", ".idea/"]
+        names = [
+            "main.py", "yarn.lock", "go.sum", "notes.txt", "README.md", "CHANGELOG", "CHANGES.md",
+            "LICENSE-MIT", "AUTHORS", ".eslintrc.json", ".prettierrc", "app.min.js", "app.js",
+            "style.min.css", "bundle.js.map", "icon.svg", "font.woff2", "Jenkinsfile", ".gitignore",
+            "requirements.txt", "requirements-dev.in", "md", ".md", "txt", "a.lock.json", "file[1].py",
+            "Pipfile.lock", ".DS_Store", "x.png.bak", "docs",
+        ]
+        for d, name in itertools.product(dirs, names):
+            path = d + name
+            with self.subTest(path=path):
+                self.assertEqual(is_excluded_file(path), reference(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
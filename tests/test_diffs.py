@@ -0,0 +1,105 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from backend.ingestion.diffs import CHARS_PER_TOKEN, DiffBatcher, get_diff_for_commit, truncate_diff
+from tests.gitrepo import GitRepo
+
+
+def section(path: str, body_lines: int) -> str:
+    body = "\n".join(f"+line {i}" for i in range(body_lines))
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -0,0 +1 @@\n{body}"
+
+
+class TruncateDiffTest(unittest.TestCase):
+    def test_small_diff_unchanged(self):
+        diff = " a.py | 1 +\n" + "\n" + section("a.py", 3)
+        self.assertEqual(truncate_diff(diff, max_tokens=1000), diff)
+
+    def test_drops_excluded_files(self):
+        diff = "\n".join([section("a.py", 2), section("package-lock.json", 50), section("b.py", 2)])
+        out = truncate_diff(diff, max_tokens=1000)
+        self.assertNotIn("package-lock.json", out)
+        self.assertEqual(out, "\n".join([section("a.py", 2), section("b.py", 2)]))
+
+    def test_only_excluded_files(self):
+        self.assertEqual(truncate_diff(section("README.md", 5), max_tokens=1000), "")
+
+    def test_fits_budget(self):
+        diff = "\n".join(section(f"f{i}.py", 200) for i in range(5))
+        for tokens in (50, 200, 1000):
+            with self.subTest(tokens=tokens):
+                out = truncate_diff(diff, max_tokens=tokens)
+                # Each truncated section gains a "\n... [truncated]" marker
+                self.assertLessEqual(len(out), tokens * CHARS_PER_TOKEN + 5 * len("\n... [truncated]") + 5)
+
+    def test_small_sections_kept_whole(self):
+        small = section("small.py", 2)
+        big = section("big.py", 2000)
+        out = truncate_diff(big + "\n" + small, max_tokens=500)
+        self.assertTrue(out.endswith(small))
+        self.assertIn("... [truncated]", out)
+        # The big section gets everything the small one leaves over
+        self.assertGreater(len(out), 500 * CHARS_PER_TOKEN - 50)
+
+    def test_budget_shared_fairly(self):
+        diff = "\n".join(section(f"f{i}.py", 1000) for i in range(4))
+        out = truncate_diff(diff, max_tokens=1000)
+        parts = out.split("\ndiff --git ")
+        self.assertEqual(len(parts), 4)
+        lengths = [len(p) for p in parts]
+        self.assertLessEqual(max(lengths) - min(lengths), len("diff --git ") + 1)
+
+
+class DiffBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        repo = self.repo = GitRepo(Path(self._tmp.name))
+        self.commits = [
+            repo.commit("root", **{"a.py": "a\n" * 20, "b.py": "b\n"}),
+            repo.commit("edit", **{"a.py": "a\n" * 19 + "z\n"}),
+            repo.commit("empty"),
+        ]
+        repo.git("mv", "b.py", "c.py")
+        self.commits.append(repo.commit("rename", **{"d.py": "d\n"}))
+        repo.git("checkout", "-q", "-b", "side", "HEAD~1")
+        side = repo.commit("side", **{"e.py": "e\n"})
+        repo.git("checkout", "-q", "main")
+        repo.git("merge", "-q", "--no-ff", "-m", "merge", side)
+        self.commits += [side, repo.git("rev-parse", "HEAD").strip()]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_matches_git_show(self):
+        async def run():
+            async with DiffBatcher(self.repo.path) as batcher:
+                batched = await asyncio.gather(*(batcher.diff(h) for h in self.commits))
+            shown = [await get_diff_for_commit(self.repo.path, h) for h in self.commits]
+            return batched, shown
+
+        batched, shown = asyncio.run(run())
+        self.assertEqual(batched, shown)
+        self.assertIn("a.py", batched[1])
+        self.assertEqual(batched[2], "")
+
+    def test_non_hex_falls_back(self):
+        async def run():
+            async with DiffBatcher(self.repo.path) as batcher:
+                return await batcher.diff("HEAD~1"), await batcher.diff(self.commits[1])
+
+        by_ref, by_hash = asyncio.run(run())
+        self.assertIn("d.py", by_ref)
+        self.assertIn("a.py", by_hash)
+
+    def test_unknown_commit_does_not_stall(self):
+        async def run():
+            async with DiffBatcher(self.repo.path) as batcher:
+                return await asyncio.wait_for(batcher.diff("0" * 40), timeout=10)
+
+        self.assertEqual(asyncio.run(run()), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import re
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import httpx
+
+from backend.ingestion import github_graphql as gql
+
+NOW = datetime.now(timezone.utc)
+
+
+def merged_at(days_ago: int) -> str:
+    return (NOW - timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def pr_node(number: int) -> dict:
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "author": {"login": "alice", "__typename": "User"},
+        "commits": {"nodes": [{"commit": {"author": {"email": "alice@example.com"}}}]},
+        "createdAt": merged_at(2),
+        "mergedAt": merged_at(1),
+        "additions": 1,
+        "deletions": 1,
+        "changedFiles": 1,
+        "body": "",
+        "comments": {"totalCount": 0},
+        "files": {"nodes": [{"path": "a.py"}]},
+        "reviews": {"nodes": []},
+    }
+
+
+async def _no_sleep(_delay):
+    return None
+
+
+class FetchPrsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.handler = None
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda req: self.handler(req)))
+        self.addAsyncCleanup(client.aclose)
+        for p in (
+            mock.patch.object(gql, "_client", client),
+            mock.patch.object(gql, "_request_slots", asyncio.Semaphore(4)),
+            mock.patch.object(gql.asyncio, "sleep", _no_sleep),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    @staticmethod
+    def listing(numbers: list[int]) -> httpx.Response:
+        nodes = [{"number": n, "mergedAt": merged_at(1)} for n in numbers]
+        return httpx.Response(200, json={"data": {"repository": {"pullRequests": {
+            "pageInfo": {"hasNextPage": False, "endCursor": None}, "nodes": nodes,
+        }}}})
+
+    @staticmethod
+    def aliases(request: httpx.Request) -> list[tuple[str, int]]:
+        body = json.loads(request.content)
+        found = re.findall(r"(pr\d+): pullRequest\(number: \$(n\d+)\)", body["query"])
+        return [(alias, body["variables"][var]) for alias, var in found]
+
+    async def fetch(self) -> list[int]:
+        return [pr.number async for pr in gql.fetch_prs("https://github.com/o/r", 6)]
+
+    async def test_unresolved_pr_does_not_drop_its_batch(self):
+        def handler(request):
+            if b"pullRequests" in request.content:
+                return self.listing([1, 2, 3])
+            return httpx.Response(200, json={
+                "data": {"repository": {a: (None if n == 2 else pr_node(n)) for a, n in self.aliases(request)}},
+                "errors": [{"message": "Could not resolve to a PullRequest with the number of 2."}],
+            })
+
+        self.handler = handler
+        self.assertEqual(await self.fetch(), [1, 3])
+
+    async def test_batch_without_repository_fails(self):
+        def handler(request):
+            if b"pullRequests" in request.content:
+                return self.listing([1])
+            return httpx.Response(200, json={"data": {"repository": None}, "errors": [{"message": "boom"}]})
+
+        self.handler = handler
+        with self.assertRaisesRegex(RuntimeError, "boom"):
+            await self.fetch()
+
+    async def test_non_json_body_is_retried(self):
+        calls = 0
+
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                return httpx.Response(200, text="<html>Bad gateway</html>")
+            if b"pullRequests" in request.content:
+                return self.listing([1])
+            return httpx.Response(200, json={"data": {"repository": {a: pr_node(n) for a, n in self.aliases(request)}}})
+
+        self.handler = handler
+        self.assertEqual(await self.fetch(), [1])
+        self.assertEqual(calls, 3)
+
+    async def test_listing_errors_are_not_partial(self):
+        self.handler = lambda request: httpx.Response(
+            200, json={"data": None, "errors": [{"message": "Could not resolve to a Repository"}]}
+        )
+        with self.assertRaisesRegex(RuntimeError, "Could not resolve to a Repository"):
+            await self.fetch()
+
+
+if __name__ == "__main__":
+    unittest.main()
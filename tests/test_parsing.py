@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+
+from backend.agents.parsing import JsonScanner, extract_json, read_json
+
+
+def scan(*chunks: str) -> JsonScanner:
+    scanner = JsonScanner()
+    for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    return scanner
+
+
+class ExtractJsonTest(unittest.TestCase):
+    def test_plain_text_is_stripped(self):
+        self.assertEqual(extract_json('  {"a": 1}\n'), '{"a": 1}')
+
+    def test_fenced_json(self):
+        self.assertEqual(extract_json('Here:\n```json\n{"a": 1}\n```\ntrailing'), '{"a": 1}')
+
+    def test_unlabelled_fence(self):
+        self.assertEqual(extract_json('```\n[1, 2]\n```'), "[1, 2]")
+
+    def test_unclosed_fence_returns_text(self):
+        self.assertEqual(extract_json('```json\n{"a": 1}'), '```json\n{"a": 1}')
+
+
+class JsonScannerTest(unittest.TestCase):
+    def test_object(self):
+        scanner = scan('{"a": {"b": [1, 2]}} trailing')
+        self.assertTrue(scanner.complete)
+        self.assertEqual(scanner.text(), '{"a": {"b": [1, 2]}}')
+
+    def test_array(self):
+        self.assertEqual(scan("[[1], [2]], [3]").text(), "[[1], [2]]")
+
+    def test_fence_before_value_is_ignored(self):
+        self.assertEqual(scan('```json\n{"a": 1}\n```').text(), '{"a": 1}')
+
+    def test_quote_before_value_is_ignored(self):
+        self.assertEqual(scan('Reply "x": {"a": 1}').text(), '{"a": 1}')
+
+    def test_braces_inside_strings(self):
+        text = '{"s": "}{][", "t": "a \\" } b"}'
+        self.assertEqual(scan(text + " extra }").text(), text)
+
+    def test_escaped_backslash_before_quote(self):
+        text = '{"s": "C:\\\\"}'
+        self.assertEqual(scan(text + "}").text(), text)
+
+    def test_value_split_across_chunks(self):
+        chunks = ['```json\n{"a', '": "x}', '", "b": [', "1]", "}\n```", "ignored"]
+        scanner = JsonScanner()
+        done = [scanner.feed(c) for c in chunks]
+        self.assertEqual(done, [False, False, False, False, True, True])
+        self.assertEqual(scanner.text(), '{"a": "x}", "b": [1]}')
+
+    def test_stops_at_first_close(self):
+        scanner = JsonScanner()
+        self.assertTrue(scanner.feed('{"a": 1}{"b": 2}'))
+        self.assertTrue(scanner.feed('more'))
+        self.assertEqual(scanner.text(), '{"a": 1}')
+
+    def test_fence_overrides_prose_brackets(self):
+        text = 'Result [see below:\n```json\n[{"a": 1}]\n```'
+        self.assertEqual(scan(*text.partition("```")).text(), '[{"a": 1}]')
+
+    def test_backticks_inside_strings_are_not_fences(self):
+        text = '{"s": "```"}'
+        self.assertEqual(scan(text + "}").text(), text)
+
+    def test_unclosed_value_returns_all_text(self):
+        scanner = scan('prefix {"a": [1, 2')
+        self.assertFalse(scanner.complete)
+        self.assertEqual(scanner.text(), 'prefix {"a": [1, 2')
+
+
+class FakeStream:
+    def __init__(self, *chunks: str):
+        self.consumed: list[str] = []
+        self.text_stream = self._chunks(chunks)
+
+    async def _chunks(self, chunks):
+        for chunk in chunks:
+            self.consumed.append(chunk)
+            yield chunk
+
+
+class ReadJsonTest(unittest.TestCase):
+    def test_stops_reading_once_value_closes(self):
+        stream = FakeStream('```json\n{"a": ', '1}', '\n```', " trailing")
+        self.assertEqual(asyncio.run(read_json(stream)), {"a": 1})
+        self.assertEqual(stream.consumed, ['```json\n{"a": ', '1}'])
+
+    def test_prose_brackets_fall_back_to_the_fence(self):
+        stream = FakeStream("Here is the result [see below]:\n", '```json\n[{"a": 1}]\n```\n')
+        self.assertEqual(asyncio.run(read_json(stream)), [{"a": 1}])
+
+    def test_malformed_reply_raises(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(read_json(FakeStream("no json here")))
+
+
+if __name__ == "__main__":
+    unittest.main()
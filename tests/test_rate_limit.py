@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from backend.api import routes
+from backend.api.wheel_timer import WheelTimer
+
+WINDOW = 100
+
+
+class SlidingWindowRateLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 10 * WINDOW
+        patches = [
+            mock.patch.object(routes, "RATE_LIMIT_MAX", 3),
+            mock.patch.object(routes, "RATE_LIMIT_WINDOW", WINDOW),
+            mock.patch.object(routes, "_rate_limits", {}),
+            mock.patch.object(routes, "_rate_limit_expiry", WheelTimer(bucket_size=10)),
+            mock.patch.object(routes.time, "monotonic", lambda: self.now),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def allowed(self, n: int, ip: str = "1.2.3.4") -> list[bool]:
+        return [routes._check_rate_limit(ip) for _ in range(n)]
+
+    def test_limit_within_a_window(self):
+        self.assertEqual(self.allowed(4), [True, True, True, False])
+        self.assertEqual(self.allowed(1, ip="5.6.7.8"), [True])
+
+    def test_previous_window_weighs_by_overlap(self):
+        self.allowed(3)
+        # A quarter into the next window, the previous 3 still count as 2.25
+        self.now = 11 * WINDOW + WINDOW // 4
+        self.assertEqual(self.allowed(2), [True, False])
+        # Three quarters in, they count as 0.75 on top of the 1 already allowed
+        self.now = 11 * WINDOW + 3 * WINDOW // 4
+        self.assertEqual(self.allowed(3), [True, True, False])
+
+    def test_counts_reset_after_two_windows(self):
+        self.allowed(3)
+        self.now = 12 * WINDOW
+        self.assertEqual(self.allowed(4), [True, True, True, False])
+
+    def test_rejected_requests_are_not_counted(self):
+        self.allowed(10)
+        self.now = 11 * WINDOW + WINDOW // 2
+        # The previous window counts as 1.5, not 5
+        self.assertEqual(self.allowed(3), [True, True, False])
+
+    def test_cleanup_prunes_stale_entries(self):
+        self.allowed(1, ip="idle")
+        self.now = 11 * WINDOW
+        self.allowed(1, ip="busy")
+        self.now = 12 * WINDOW
+        self.allowed(1, ip="idle")  # used again, so its entry is rescheduled
+        # "busy" last counted in window 11, so both its counts have rolled out
+        self.now = 13 * WINDOW
+        asyncio.run(routes.cleanup_old_jobs())
+        self.assertEqual(set(routes._rate_limits), {"idle"})
+        self.now = 15 * WINDOW
+        asyncio.run(routes.cleanup_old_jobs())
+        self.assertEqual(routes._rate_limits, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
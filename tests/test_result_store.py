@@ -0,0 +1,72 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from backend.api.result_store import ResultStore
+from backend.api.schemas import AnalysisResult
+
+
+def result(name: str, commits: int = 1) -> AnalysisResult:
+    return AnalysisResult(
+        repo_url=f"https://github.com/{name}",
+        repo_name=name,
+        analysis_months=6,
+        total_commits=commits,
+        total_contributors=2,
+    )
+
+
+class ResultStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.store = ResultStore(self.dir / "db" / "results.sqlite")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_put_and_get(self):
+        self.store.put("o/a", result("o/a"))
+        self.assertEqual(AnalysisResult.model_validate_json(self.store.get("o/a")), result("o/a"))
+        self.assertIsNone(self.store.get("o/missing"))
+
+    def test_put_replaces_existing(self):
+        self.store.put("o/a", result("o/a", commits=1), analyzed_at=1)
+        self.store.put("o/a", result("o/a", commits=7), analyzed_at=2)
+        summaries = self.store.summaries()
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]["total_commits"], 7)
+
+    def test_summaries_most_recent_first(self):
+        self.store.put("o/old", result("o/old"), analyzed_at=100)
+        self.store.put("o/new", result("o/new"), analyzed_at=200)
+        self.assertEqual(
+            self.store.summaries(),
+            [
+                {"repo_name": "o/new", "repo_url": "https://github.com/o/new", "total_commits": 1,
+                 "total_contributors": 2, "analysis_months": 6, "analyzed_at": 200},
+                {"repo_name": "o/old", "repo_url": "https://github.com/o/old", "total_commits": 1,
+                 "total_contributors": 2, "analysis_months": 6, "analyzed_at": 100},
+            ],
+        )
+
+    def test_import_files(self):
+        legacy = self.dir / "cached"
+        legacy.mkdir()
+        (legacy / "o_a.json").write_text(result("o/a").model_dump_json())
+        (legacy / "o_a.meta.json").write_text(json.dumps({"repo_name": "o/a"}))
+        (legacy / "o_b.json").write_text(result("o/b", commits=3).model_dump_json())
+        (legacy / "broken.json").write_text("{not json")
+        self.store.put("o/b", result("o/b", commits=9))
+
+        self.assertEqual(self.store.import_files(legacy), 1)
+
+        self.assertEqual(AnalysisResult.model_validate_json(self.store.get("o/a")), result("o/a"))
+        # Existing rows win over files
+        self.assertEqual(AnalysisResult.model_validate_json(self.store.get("o/b")).total_commits, 9)
+        self.assertEqual(sorted(p.name for p in legacy.iterdir()), ["broken.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
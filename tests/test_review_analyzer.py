@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+
+from backend.agents import review_analyzer
+from backend.agents.review_analyzer import _fast_classify, _is_trivial, _to_classifications
+from backend.api.schemas import PRData, PRReview
+from backend.cache import AsyncCache
+
+
+def review(state: str, body: str = "", comments: list[str] | None = None) -> PRReview:
+    return PRReview(author="bob", state=state, body=body, review_comments=comments or [])
+
+
+def pr(*reviews: PRReview, number: int = 1) -> PRData:
+    return PRData(number=number, title="t", author="alice", created_at="", reviews=list(reviews))
+
+
+GOOD = {"reviewer": "bob", "quality": "thorough", "signals": ["Edge case"], "knowledge_transfer": True, "summary": "s"}
+
+
+class TrivialReviewTest(unittest.TestCase):
+    def test_brief_approval_is_trivial(self):
+        self.assertTrue(_is_trivial(review("APPROVED", "LGTM, thanks!")))
+
+    def test_empty_review_is_trivial_in_any_state(self):
+        for state in ("APPROVED", "COMMENTED", "CHANGES_REQUESTED"):
+            with self.subTest(state=state):
+                self.assertTrue(_is_trivial(review(state, "  ")))
+
+    def test_brief_change_request_needs_the_model(self):
+        self.assertFalse(_is_trivial(review("CHANGES_REQUESTED", "This null check is wrong, please fix")))
+        self.assertFalse(_is_trivial(review("COMMENTED", "Why not reuse the parser?")))
+
+    def test_long_approval_needs_the_model(self):
+        self.assertFalse(_is_trivial(review("APPROVED", " ".join(["word"] * 10))))
+
+    def test_line_comments_need_the_model(self):
+        self.assertFalse(_is_trivial(review("APPROVED", "", ["Off by one here"])))
+
+
+class FastClassifyTest(unittest.TestCase):
+    def test_all_trivial_reviews_are_rubber_stamps(self):
+        result = _fast_classify(pr(review("APPROVED", "LGTM"), review("COMMENTED")))
+        self.assertEqual([c.quality for c in result], ["rubber_stamp", "rubber_stamp"])
+        self.assertTrue(result[0].summary.startswith("Brief approval"))
+        self.assertTrue(result[1].summary.startswith("Empty review"))
+
+    def test_any_substantive_review_needs_the_model(self):
+        self.assertIsNone(_fast_classify(pr(review("APPROVED", "LGTM"), review("CHANGES_REQUESTED", "Please fix"))))
+
+
+class ValidationTest(unittest.TestCase):
+    def test_defaults_fill_missing_and_null_fields(self):
+        [c] = _to_classifications(pr(), {"reviewer": "bob", "quality": None})
+        self.assertEqual((c.pr_number, c.reviewer, c.quality, c.signals), (1, "bob", "surface", []))
+
+    def test_wrong_types_are_rejected(self):
+        for item in ({"reviewer": ["bob"]}, {"signals": "one"}, {"knowledge_transfer": "maybe"}):
+            with self.subTest(item=item), self.assertRaises(ValueError):
+                _to_classifications(pr(), [item])
+
+
+class AnalyzeReviewsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = AsyncCache()
+        self.replies: list = []
+        for p in (
+            mock.patch.object(review_analyzer, "_cache", self.cache),
+            mock.patch.object(review_analyzer, "_classify", self.fake_classify),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def fake_classify(self, user_message, max_tokens=1024):
+        return self.replies.pop(0)
+
+    async def cached(self, p: PRData):
+        return await self.cache.get(review_analyzer._cache_key(review_analyzer._reviews_text(p)))
+
+    async def test_invalid_reply_falls_back_uncached(self):
+        p = pr(review("COMMENTED", "Why not reuse the parser?"))
+        self.replies = [[{"reviewer": {"name": "bob"}}]]
+        [c] = await review_analyzer.analyze_pr_reviews(p)
+        self.assertEqual(c.summary, "Analysis failed: ValidationError")
+        self.assertIsNone(await self.cached(p))
+
+    async def test_invalid_batch_item_is_retried_alone(self):
+        a = pr(review("COMMENTED", "Why not reuse the parser?"), number=1)
+        b = pr(review("COMMENTED", "This leaks the file handle"), number=2)
+        self.replies = [{"1": [GOOD], "2": [{"reviewer": "bob", "signals": "not a list"}]}, [GOOD]]
+        results = await review_analyzer.analyze_pr_reviews_batch([a, b])
+        self.assertEqual(sorted(c.pr_number for c in results), [1, 2])
+        self.assertEqual(self.replies, [])
+        self.assertEqual(await self.cached(b), [GOOD])
+
+
+if __name__ == "__main__":
+    unittest.main()
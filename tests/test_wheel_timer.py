@@ -0,0 +1,44 @@
+import unittest
+
+from backend.api.wheel_timer import WheelTimer
+
+
+class WheelTimerTest(unittest.TestCase):
+    def test_key_not_due_before_its_time(self):
+        timer = WheelTimer(bucket_size=10)
+        timer.schedule("a", 25)
+        self.assertEqual(timer.fetch(24.9), [])
+        self.assertEqual(timer.fetch(29.9), [])
+
+    def test_key_fires_at_most_one_bucket_late(self):
+        timer = WheelTimer(bucket_size=10)
+        timer.schedule("a", 25)
+        self.assertEqual(timer.fetch(30), ["a"])
+
+    def test_exact_bucket_boundary(self):
+        timer = WheelTimer(bucket_size=10)
+        timer.schedule("a", 30)
+        self.assertEqual(timer.fetch(30), ["a"])
+
+    def test_fetch_removes_keys(self):
+        timer = WheelTimer(bucket_size=10)
+        timer.schedule("a", 5)
+        self.assertEqual(timer.fetch(100), ["a"])
+        self.assertEqual(timer.fetch(200), [])
+
+    def test_fetch_collects_every_due_bucket(self):
+        timer = WheelTimer(bucket_size=10)
+        for key, when in [("a", 5), ("b", 15), ("c", 15), ("d", 45)]:
+            timer.schedule(key, when)
+        self.assertEqual(sorted(timer.fetch(20)), ["a", "b", "c"])
+        self.assertEqual(timer.fetch(50), ["d"])
+
+    def test_same_key_twice_in_a_bucket_fires_once(self):
+        timer = WheelTimer(bucket_size=10)
+        timer.schedule("a", 12)
+        timer.schedule("a", 18)
+        self.assertEqual(timer.fetch(20), ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()